@@ -15,3 +15,96 @@ BOT_USERNAME = os.getenv("BOT_USERNAME", "NomadeHelpBot")
 SUPPORT_GROUP = os.getenv("SUPPORT_GROUP", "https://t.me/FakeAaru")
 UPDATE_CHANNEL = os.getenv("UPDATE_CHANNEL", "https://t.me/FakeAaru")
 START_IMAGE = os.getenv("START_IMAGE", "https://files.catbox.moe/j2yhce.jpg")
+
+# Username -> user identity cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 100000))
+USER_CACHE_FLUSH_INTERVAL = int(os.getenv("USER_CACHE_FLUSH_INTERVAL", 15))
+
+# Timed sanctions scheduler
+SCHEDULER_HORIZON = int(os.getenv("SCHEDULER_HORIZON", 3600))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", 100))
+SCHEDULER_RATE = float(os.getenv("SCHEDULER_RATE", 20))
+
+# Cross-chat spam wave detection (0 threshold disables it)
+SPAM_WAVE_THRESHOLD = int(os.getenv("SPAM_WAVE_THRESHOLD", 5))
+SPAM_WAVE_DECAY = int(os.getenv("SPAM_WAVE_DECAY", 300))
+SPAM_WAVE_WIDTH = int(os.getenv("SPAM_WAVE_WIDTH", 1 << 15))
+SPAM_WAVE_DEPTH = int(os.getenv("SPAM_WAVE_DEPTH", 4))
+SPAM_WAVE_CHECKPOINT = int(os.getenv("SPAM_WAVE_CHECKPOINT", 120))
+
+# Global bans
+GBAN_SYNC_INTERVAL = int(os.getenv("GBAN_SYNC_INTERVAL", 30))
+GBAN_BLOOM_THRESHOLD = int(os.getenv("GBAN_BLOOM_THRESHOLD", 1000000))
+GBAN_FANOUT_RATE = float(os.getenv("GBAN_FANOUT_RATE", 10))
+
+# Lifecycle and caches
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", 120))
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", 600))
+ADMIN_WARMUP_DAYS = int(os.getenv("ADMIN_WARMUP_DAYS", 3))
+SHUTDOWN_DEADLINE = int(os.getenv("SHUTDOWN_DEADLINE", 20))
+
+# MongoDB client tuning and degraded mode
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+DB_OP_TIMEOUT = float(os.getenv("DB_OP_TIMEOUT", 3))
+DB_BREAKER_THRESHOLD = int(os.getenv("DB_BREAKER_THRESHOLD", 5))
+DB_BREAKER_RESET = float(os.getenv("DB_BREAKER_RESET", 15))
+DB_REPLAY_LIMIT = int(os.getenv("DB_REPLAY_LIMIT", 10000))
+
+# Batched moderation
+MODERATION_CONCURRENCY = int(os.getenv("MODERATION_CONCURRENCY", 5))
+MAX_TARGETS = int(os.getenv("MAX_TARGETS", 50))
+PURGE_CONCURRENCY = int(os.getenv("PURGE_CONCURRENCY", 3))
+# Most messages one /purge may cover
+PURGE_MAX_SPAN = int(os.getenv("PURGE_MAX_SPAN", 5000))
+# Concurrent get_users lookups while resolving command targets
+RESOLVE_CONCURRENCY = int(os.getenv("RESOLVE_CONCURRENCY", 5))
+
+# Moderation audit log
+MODLOG_CAPPED_BYTES = int(os.getenv("MODLOG_CAPPED_BYTES", 512 * 1024 * 1024))
+MODLOG_FLUSH_INTERVAL = int(os.getenv("MODLOG_FLUSH_INTERVAL", 5))
+MODLOG_BATCH_SIZE = int(os.getenv("MODLOG_BATCH_SIZE", 500))
+
+# Logging (records are written off the event loop by a QueueListener)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Records per minute per call site; "module=limit,..." overrides, 0 = unlimited
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", 30))
+LOG_RATE_OVERRIDES = os.getenv("LOG_RATE_OVERRIDES", "")
+# "module=share,..." of records below WARNING to keep, e.g. "utils.user_cache=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+# Per-chat activity stats
+STATS_FLUSH_INTERVAL = int(os.getenv("STATS_FLUSH_INTERVAL", 60))
+STATS_TOP_USERS = int(os.getenv("STATS_TOP_USERS", 20))
+STATS_RETENTION_DAYS = int(os.getenv("STATS_RETENTION_DAYS", 90))
+
+# Join captcha
+CAPTCHA_MAX_TIMEOUT = int(os.getenv("CAPTCHA_MAX_TIMEOUT", 3600))
+CAPTCHA_FLUSH_INTERVAL = int(os.getenv("CAPTCHA_FLUSH_INTERVAL", 5))
+CAPTCHA_KICK_RATE = float(os.getenv("CAPTCHA_KICK_RATE", 20))
+
+# Catch-up mode for the update backlog after downtime
+CATCHUP_STALE_AFTER = int(os.getenv("CATCHUP_STALE_AFTER", 60))
+CATCHUP_QUIET = int(os.getenv("CATCHUP_QUIET", 5))
+
+# Chat data lifecycle: cleanup after removal and periodic compaction
+CHAT_CLEANUP_DELAY = int(os.getenv("CHAT_CLEANUP_DELAY", 86400))
+CHAT_DORMANT_DAYS = int(os.getenv("CHAT_DORMANT_DAYS", 30))
+USER_DEAD_DAYS = int(os.getenv("USER_DEAD_DAYS", 30))
+COMPACT_INTERVAL = int(os.getenv("COMPACT_INTERVAL", 6 * 3600))
+COMPACT_BATCH = int(os.getenv("COMPACT_BATCH", 200))
+COMPACT_PAUSE = float(os.getenv("COMPACT_PAUSE", 2))
+# Per delete_many; a timeout halves the batch instead of tripping the breaker
+COMPACT_OP_TIMEOUT = float(os.getenv("COMPACT_OP_TIMEOUT", 30))
+# Membership checks per second while verifying dormant chats
+COMPACT_RATE = float(os.getenv("COMPACT_RATE", 2))
+
+# Pyrogram session storage: "sqlite" keeps Pyrogram's own session file,
+# "mongo" or "file" keep peers in memory and snapshot them there
+SESSION_STORAGE = os.getenv("SESSION_STORAGE", "sqlite").lower()
+SESSION_SNAPSHOT_INTERVAL = int(os.getenv("SESSION_SNAPSHOT_INTERVAL", 60))
+SESSION_FILE = os.getenv("SESSION_FILE", "group_manager_bot.session.json")
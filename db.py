@@ -1,128 +1,608 @@
 import motor.motor_asyncio
-from config import MONGO_URI, DB_NAME
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import (
+    BulkWriteError,
+    CollectionInvalid,
+    ConnectionFailure,
+    NetworkTimeout,
+    PyMongoError,
+    ServerSelectionTimeoutError,
+)
+from config import (
+    MONGO_URI,
+    DB_NAME,
+    SETTINGS_CACHE_TTL,
+    MONGO_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_TIMEOUT_MS,
+    MONGO_COMPRESSORS,
+    DB_OP_TIMEOUT,
+    DB_BREAKER_THRESHOLD,
+    DB_BREAKER_RESET,
+    DB_REPLAY_LIMIT,
+    MODLOG_CAPPED_BYTES,
+    STATS_RETENTION_DAYS,
+)
+import asyncio
+import functools
+import hashlib
+import json
 import logging
-import sys
+import time
+from collections import deque
 from datetime import datetime, timedelta
+from utils.breaker import CircuitBreaker
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ==========================================================
+# MONGO CONNECTION (lazy: opened on first use)
+# ==========================================================
+client = None
+_database = None
+
+def connect():
+    global client, _database
+    if _database is None:
+        if not MONGO_URI:
+            raise RuntimeError("❌ MONGO_URI empty hai! config.py check karo.")
+        client = motor.motor_asyncio.AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_TIMEOUT_MS,
+            compressors=MONGO_COMPRESSORS or None,
+        )
+        _database = client[DB_NAME]
+        logger.info("✅ MongoDB client created")
+    return _database
+
+def close():
+    global client, _database
+    if client is not None:
+        client.close()
+        logger.info("✅ MongoDB connection closed")
+    client = None
+    _database = None
+
+class _LazyDatabase:
+    def __getattr__(self, name):
+        return getattr(connect(), name)
+
+    def __getitem__(self, name):
+        return connect()[name]
+
+db = _LazyDatabase()
+
+# ==========================================================
+# 🧯 STORAGE GUARD (per-operation timeout + circuit breaker)
+# ==========================================================
+class StorageUnavailable(Exception):
+    pass
+
+breaker = CircuitBreaker("MongoDB", DB_BREAKER_THRESHOLD, DB_BREAKER_RESET)
+_replay_queue = deque(maxlen=DB_REPLAY_LIMIT)   # (func, args, kwargs)
+_replay_task = None
+
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionFailure, ServerSelectionTimeoutError, NetworkTimeout)
+
+def is_transient(error: Exception) -> bool:
+    """Worth retrying later: MongoDB was unreachable, not the operation wrong."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+async def _call(func, args, kwargs):
+    if not breaker.allow():
+        raise StorageUnavailable("MongoDB circuit is open")
+    try:
+        result = await asyncio.wait_for(func(*args, **kwargs), DB_OP_TIMEOUT)
+    except (asyncio.TimeoutError, PyMongoError) as e:
+        if not is_transient(e):
+            # The server answered: a bad write is the caller's problem, not an outage
+            breaker.record_success()
+            raise
+        breaker.record_failure()
+        metrics.inc("db_failures")
+        metrics.set("db_circuit_open", int(breaker.state != "closed"))
+        raise StorageUnavailable(f"{func.__name__}: {e!r}") from e
+
+    breaker.record_success()
+    metrics.set("db_circuit_open", 0)
+    if _replay_queue:
+        _start_replay()
+    return result
+
+def guarded(func):
+    """Fail fast with StorageUnavailable instead of hanging on a stalled cluster."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _call(func, args, kwargs)
+    return wrapper
+
+def replayable(func):
+    """
+    Like `guarded`, but a failed write is queued and replayed once MongoDB
+    is back. While the queue is not empty new writes join its tail, so a
+    write made after recovery never lands under an older queued one.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _replay_queue:
+            _replay_queue.append((func, args, kwargs))
+            metrics.set("db_replay_queue", len(_replay_queue))
+            if breaker.state != "open":
+                _start_replay()
+            return
+        try:
+            return await _call(func, args, kwargs)
+        except StorageUnavailable as e:
+            _replay_queue.append((func, args, kwargs))
+            metrics.set("db_replay_queue", len(_replay_queue))
+            logger.warning(f"Queued {func.__name__} for replay: {e}")
+    return wrapper
+
+def _start_replay():
+    global _replay_task
+    if _replay_task is None or _replay_task.done():
+        _replay_task = asyncio.get_running_loop().create_task(replay_writes())
+
+async def replay_writes():
+    replayed = 0
+    while _replay_queue and breaker.allow():
+        # Left queued while in flight so new writes keep lining up behind it
+        item = _replay_queue[0]
+        func, args, kwargs = item
+        try:
+            await asyncio.wait_for(func(*args, **kwargs), DB_OP_TIMEOUT)
+            replayed += 1
+        except (asyncio.TimeoutError, PyMongoError) as e:
+            if is_transient(e):
+                breaker.record_failure()
+                break
+            # Would fail forever and hold every later write behind it
+            logger.error(f"Dropped queued {func.__name__}, it cannot succeed: {e!r}")
+            metrics.inc("db_replay_dropped")
+        breaker.record_success()
+        if _replay_queue and _replay_queue[0] is item:
+            _replay_queue.popleft()
+    metrics.set("db_replay_queue", len(_replay_queue))
+    return f"{replayed} writes replayed, {len(_replay_queue)} left"
 
 # ==========================================================
-# LOGGING
+# ⚡ SETTINGS CACHE (per-chat settings documents)
 # ==========================================================
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(levelname)s] %(asctime)s - %(message)s'
+SETTINGS_COLLECTIONS = (
+    "welcome", "locks", "anticheater_settings", "warn_settings", "captcha_settings", "chat_presets",
 )
+_settings_cache = {}   # (collection, chat_id) -> (expires_at, doc)
+
+async def _find_settings(collection: str, chat_id: int) -> dict:
+    return await db[collection].find_one({"chat_id": chat_id}, {"_id": 0}) or {}
+
+async def _get_settings(collection: str, chat_id: int) -> dict:
+    key = (collection, chat_id)
+    cached = _settings_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    try:
+        doc = await _call(_find_settings, (collection, chat_id), {})
+    except StorageUnavailable:
+        # Degraded mode: keep serving the last known settings
+        return cached[1] if cached else {}
+
+    _settings_cache[key] = (time.monotonic() + SETTINGS_CACHE_TTL, doc)
+    return doc
+
+def _invalidate_settings(collection: str, chat_id: int):
+    # Expire but keep the document as the last known value
+    cached = _settings_cache.get((collection, chat_id))
+    if cached:
+        _settings_cache[(collection, chat_id)] = (0, cached[1])
+
+async def warm_settings_cache():
+    count = 0
+    for collection in SETTINGS_COLLECTIONS:
+        expires_at = time.monotonic() + SETTINGS_CACHE_TTL
+        async for doc in db[collection].find({}, {"_id": 0}):
+            if "chat_id" in doc:
+                _settings_cache.setdefault((collection, doc["chat_id"]), (expires_at, doc))
+                count += 1
+    return count
 
 # ==========================================================
-# MONGO CONNECTION
+# 🧬 SETTINGS PRESETS (shared configs, per-chat overrides as a diff)
 # ==========================================================
-client = None
-db = None
+# Settings a preset covers; warn and captcha settings stay per chat
+PRESET_COLLECTIONS = ("locks", "welcome", "anticheater_settings")
+
+_preset_cache = {}   # name -> (expires_at, doc)
+_merged_cache = {}   # (collection, chat_id) -> (preset part, override, merged)
+
+def settings_hash(settings: dict) -> str:
+    """Content hash of {collection: doc}, ignoring which chat the docs belong to."""
+    canonical = {
+        collection: {k: v for k, v in doc.items() if k != "chat_id"}
+        for collection, doc in settings.items()
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def _merge(base: dict, override: dict) -> dict:
+    merged = dict(base)
+    for key, value in override.items():
+        if key == "chat_id":
+            continue
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+async def _find_preset(name: str):
+    return await db.presets.find_one({"name": name}, {"_id": 0})
+
+async def get_preset(name: str):
+    cached = _preset_cache.get(name)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    try:
+        doc = await _call(_find_preset, (name,), {})
+    except StorageUnavailable:
+        return cached[1] if cached else None
+
+    _preset_cache[name] = (time.monotonic() + SETTINGS_CACHE_TTL, doc)
+    return doc
+
+async def _get_effective(collection: str, chat_id: int) -> dict:
+    """The chat's settings document applied over its preset, if it has one."""
+    doc = await _get_settings(collection, chat_id)
+    name = (await _get_settings("chat_presets", chat_id)).get("preset")
+    preset = await get_preset(name) if name else None
+    if not preset:
+        return doc
+
+    base = preset["settings"].get(collection, {})
+    # No overrides: every chat on this preset shares the same document
+    if doc.keys() <= {"chat_id"}:
+        return base
 
-if not MONGO_URI:
-    logging.error("❌ MONGO_URI empty hai! config.py check karo.")
-    sys.exit(1)
+    key = (collection, chat_id)
+    memo = _merged_cache.get(key)
+    if memo and memo[0] is base and memo[1] is doc:
+        return memo[2]
+    merged = _merge(base, doc)
+    _merged_cache[key] = (base, doc, merged)
+    return merged
 
-try:
-    client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-    db = client[DB_NAME]
-    logging.info("✅ MongoDB connected successfully!")
-except Exception as e:
-    logging.error(f"❌ MongoDB connection failed: {e}")
-    sys.exit(1)
+async def get_chat_settings(chat_id: int) -> tuple:
+    """Effective documents in PRESET_COLLECTIONS order."""
+    return tuple([await _get_effective(collection, chat_id) for collection in PRESET_COLLECTIONS])
+
+async def get_chat_preset(chat_id: int):
+    return (await _get_settings("chat_presets", chat_id)).get("preset")
+
+async def export_chat_settings(chat_id: int) -> dict:
+    """Effective settings as {collection: doc}, detached from the chat."""
+    docs = zip(PRESET_COLLECTIONS, await get_chat_settings(chat_id))
+    return {collection: {k: v for k, v in doc.items() if k != "chat_id"} for collection, doc in docs}
+
+@guarded
+async def save_preset(name: str, owner_chat: int, created_by: int, settings: dict) -> str:
+    """Create or update a preset; one write reaches every chat using it."""
+    digest = settings_hash(settings)
+    await db.presets.update_one(
+        {"name": name},
+        {
+            "$set": {"settings": settings, "hash": digest, "updated_at": datetime.utcnow()},
+            "$setOnInsert": {"owner_chat": owner_chat, "created_by": created_by},
+        },
+        upsert=True
+    )
+    cached = _preset_cache.get(name)
+    if cached:
+        _preset_cache[name] = (0, cached[1])
+    return digest
+
+@guarded
+async def list_presets(chat_id: int, shared_by: int) -> list:
+    """Presets owned by `chat_id` or created by `shared_by`, with how many chats use each."""
+    cursor = db.presets.find(
+        {"$or": [{"owner_chat": chat_id}, {"created_by": shared_by}]},
+        {"_id": 0, "name": 1, "owner_chat": 1, "created_by": 1, "hash": 1}
+    ).sort("name", ASCENDING)
+    presets = [doc async for doc in cursor]
+    if not presets:
+        return []
+
+    usage = {}
+    pipeline = [
+        {"$match": {"preset": {"$in": [preset["name"] for preset in presets]}}},
+        {"$group": {"_id": "$preset", "chats": {"$sum": 1}}},
+    ]
+    async for doc in db.chat_presets.aggregate(pipeline):
+        usage[doc["_id"]] = doc["chats"]
+    return [{**preset, "chats": usage.get(preset["name"], 0)} for preset in presets]
+
+@replayable
+async def use_preset(chat_id: int, name: str):
+    # The chat's own documents become an empty diff on top of the preset
+    await db.chat_presets.update_one(
+        {"chat_id": chat_id},
+        {"$set": {"preset": name}},
+        upsert=True
+    )
+    for collection in PRESET_COLLECTIONS:
+        await db[collection].delete_one({"chat_id": chat_id})
+        _invalidate_settings(collection, chat_id)
+    _invalidate_settings("chat_presets", chat_id)
+
+@replayable
+async def detach_preset(chat_id: int, settings: dict):
+    """Leave the preset but keep its effect: `settings` become the chat's own documents."""
+    for collection, doc in settings.items():
+        await db[collection].replace_one({"chat_id": chat_id}, {**doc, "chat_id": chat_id}, upsert=True)
+        _invalidate_settings(collection, chat_id)
+    await db.chat_presets.delete_one({"chat_id": chat_id})
+    _invalidate_settings("chat_presets", chat_id)
 
 # ==========================================================
 # 👋 WELCOME SYSTEM
 # ==========================================================
+@replayable
 async def set_welcome_message(chat_id, text: str):
     await db.welcome.update_one(
         {"chat_id": chat_id},
         {"$set": {"message": text}},
         upsert=True
     )
+    _invalidate_settings("welcome", chat_id)
 
 async def get_welcome_message(chat_id):
-    data = await db.welcome.find_one({"chat_id": chat_id})
-    return data.get("message") if data else None
+    data = await _get_effective("welcome", chat_id)
+    return data.get("message")
 
+@replayable
 async def set_welcome_status(chat_id, status: bool):
     await db.welcome.update_one(
         {"chat_id": chat_id},
         {"$set": {"enabled": status}},
         upsert=True
     )
+    _invalidate_settings("welcome", chat_id)
 
 async def get_welcome_status(chat_id) -> bool:
-    data = await db.welcome.find_one({"chat_id": chat_id})
-    return bool(data.get("enabled", True)) if data else True
+    data = await _get_effective("welcome", chat_id)
+    return bool(data.get("enabled", True))
 
 # ==========================================================
 # 🔒 LOCK SYSTEM
 # ==========================================================
+@replayable
 async def set_lock(chat_id, lock_type, status: bool):
     await db.locks.update_one(
         {"chat_id": chat_id},
         {"$set": {f"locks.{lock_type}": status}},
         upsert=True
     )
+    _invalidate_settings("locks", chat_id)
 
 async def get_locks(chat_id):
-    data = await db.locks.find_one({"chat_id": chat_id})
-    return data.get("locks", {}) if data else {}
+    data = await _get_effective("locks", chat_id)
+    return data.get("locks", {})
+
+LANGUAGE_DEFAULTS = {"mode": "allow", "scripts": ["latin"], "threshold": 0.3}
+
+@replayable
+async def set_language_lock(chat_id, **fields):
+    await db.locks.update_one(
+        {"chat_id": chat_id},
+        {"$set": {f"language.{key}": value for key, value in fields.items()}},
+        upsert=True
+    )
+    _invalidate_settings("locks", chat_id)
+
+async def get_language_lock(chat_id) -> dict:
+    data = await _get_effective("locks", chat_id)
+    return {**LANGUAGE_DEFAULTS, **data.get("language", {})}
 
 # ==========================================================
 # ⚠️ WARN SYSTEM
 # ==========================================================
-async def add_warn(chat_id: int, user_id: int) -> int:
-    data = await db.warns.find_one({"chat_id": chat_id, "user_id": user_id})
-    count = data.get("count", 0) + 1 if data else 1
+WARN_DEFAULTS = {"limit": 3, "action": "mute", "expiry": 0}
+WARN_ACTIONS = ("mute", "kick", "ban")
 
-    await db.warns.update_one(
-        {"chat_id": chat_id, "user_id": user_id},
-        {"$set": {"count": count}},
-        upsert=True
-    )
-    return count
+def _active_warns(chat_id: int, user_id: int) -> dict:
+    # TTL monitor runs about once a minute, so filter expired entries explicitly too
+    return {
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "cleared_at": {"$exists": False},
+        "$or": [
+            {"expires_at": {"$exists": False}},
+            {"expires_at": {"$gt": datetime.utcnow()}},
+        ],
+    }
+
+@guarded
+async def add_warn(chat_id: int, user_id: int, issuer_id: int = None, reason: str = None, expiry: int = 0) -> int:
+    now = datetime.utcnow()
+    doc = {
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "issuer_id": issuer_id,
+        "reason": reason,
+        "created_at": now,
+    }
+    if expiry:
+        doc["expires_at"] = now + timedelta(seconds=expiry)
 
+    await db.warnings.insert_one(doc)
+    return await get_warns(chat_id, user_id)
+
+@guarded
 async def get_warns(chat_id: int, user_id: int) -> int:
-    data = await db.warns.find_one({"chat_id": chat_id, "user_id": user_id})
-    return data.get("count", 0) if data else 0
+    return await db.warnings.count_documents(_active_warns(chat_id, user_id))
+
+@guarded
+async def get_warn_history(chat_id: int, user_id: int, before_id=None, limit: int = 10) -> list:
+    query = _active_warns(chat_id, user_id)
+    if before_id:
+        query["_id"] = {"$lt": before_id}
+    cursor = db.warnings.find(query).sort("_id", DESCENDING).limit(limit)
+    return [doc async for doc in cursor]
 
+@replayable
 async def reset_warns(chat_id: int, user_id: int):
+    # Cleared, not deleted: who warned whom and why stays on record
+    await db.warnings.update_many(
+        {"chat_id": chat_id, "user_id": user_id, "cleared_at": {"$exists": False}},
+        {"$set": {"cleared_at": datetime.utcnow()}}
+    )
     await db.warns.delete_one({"chat_id": chat_id, "user_id": user_id})
 
+async def migrate_legacy_warns():
+    """Turn counters left in the old `warns` collection into warning documents."""
+    migrated = 0
+    now = datetime.utcnow()
+    async for legacy in db.warns.find({}):
+        count = legacy.get("count", 0)
+        if count > 0:
+            await db.warnings.insert_many([
+                {
+                    "chat_id": legacy["chat_id"],
+                    "user_id": legacy["user_id"],
+                    "issuer_id": None,
+                    "reason": "carried over from the old warn counter",
+                    "created_at": now,
+                }
+                for _ in range(count)
+            ])
+        await db.warns.delete_one({"_id": legacy["_id"]})
+        migrated += 1
+    return f"{migrated} legacy counters migrated"
+
+@replayable
+async def set_warn_setting(chat_id: int, key: str, value):
+    await db.warn_settings.update_one(
+        {"chat_id": chat_id},
+        {"$set": {key: value}},
+        upsert=True
+    )
+    _invalidate_settings("warn_settings", chat_id)
+
+async def get_warn_settings(chat_id: int) -> dict:
+    data = await _get_settings("warn_settings", chat_id)
+    return {**WARN_DEFAULTS, **{k: v for k, v in data.items() if k != "chat_id"}}
+
 # ==========================================================
 # 👤 USER SYSTEM (Broadcast)
 # ==========================================================
+@replayable
 async def add_user(user_id: int, first_name: str):
+    # Talking to the bot again undoes a block seen during broadcast
     await db.users.update_one(
         {"user_id": user_id},
-        {"$set": {"first_name": first_name}},
+        {"$set": {"first_name": first_name}, "$unset": {"blocked_at": ""}},
         upsert=True
     )
 
+@guarded
 async def get_all_users():
     cursor = db.users.find({}, {"_id": 0, "user_id": 1})
     return [doc["user_id"] async for doc in cursor if "user_id" in doc]
 
+# ==========================================================
+# 🪪 USER IDENTITY INDEX (username -> user_id)
+# ==========================================================
+@guarded
+async def save_user_identities(entries: list):
+    """Write-behind batch of (user_id, username, first_name) tuples."""
+    if not entries:
+        return
+
+    now = datetime.utcnow()
+    ops = []
+    for user_id, username, first_name in entries:
+        if username:
+            # Username was taken over by another account: forget the old owner
+            ops.append(UpdateMany(
+                {"username": username, "user_id": {"$ne": user_id}},
+                {"$unset": {"username": ""}}
+            ))
+        update = {"$set": {"first_name": first_name, "updated_at": now}}
+        if username:
+            update["$set"]["username"] = username
+        else:
+            update["$unset"] = {"username": ""}
+        ops.append(UpdateOne({"user_id": user_id}, update, upsert=True))
+    await db.user_index.bulk_write(ops, ordered=True)
+
+@guarded
+async def find_user_identity(username: str = None, user_id: int = None):
+    query = {"username": username} if username else {"user_id": user_id}
+    return await db.user_index.find_one(query, {"_id": 0})
+
 # ==========================================================
 # 🛡️ ANTI-CHEATER SETTINGS
 # ==========================================================
+@replayable
 async def set_anticheater(chat_id: int, status: bool):
     await db.anticheater_settings.update_one(
         {"chat_id": chat_id},
         {"$set": {"enabled": status}},
         upsert=True
     )
+    _invalidate_settings("anticheater_settings", chat_id)
 
 async def get_anticheater(chat_id: int) -> bool:
-    data = await db.anticheater_settings.find_one({"chat_id": chat_id})
-    return bool(data.get("enabled", False)) if data else False
+    data = await _get_effective("anticheater_settings", chat_id)
+    return bool(data.get("enabled", False))
+
+# ==========================================================
+# 🧩 JOIN CAPTCHA
+# ==========================================================
+CAPTCHA_DEFAULTS = {"mode": "off", "timeout": 300}
+CAPTCHA_MODES = ("off", "button", "math")
+
+@replayable
+async def set_captcha(chat_id: int, **fields):
+    await db.captcha_settings.update_one(
+        {"chat_id": chat_id},
+        {"$set": fields},
+        upsert=True
+    )
+    _invalidate_settings("captcha_settings", chat_id)
+
+async def get_captcha_settings(chat_id: int) -> dict:
+    data = await _get_settings("captcha_settings", chat_id)
+    return {**CAPTCHA_DEFAULTS, **{k: v for k, v in data.items() if k in CAPTCHA_DEFAULTS}}
+
+@guarded
+async def save_captcha_pending(upserts: list, deletes: list):
+    ops = [
+        ReplaceOne({"chat_id": doc["chat_id"], "user_id": doc["user_id"]}, doc, upsert=True)
+        for doc in upserts
+    ]
+    ops += [DeleteOne({"chat_id": chat_id, "user_id": user_id}) for chat_id, user_id in deletes]
+    if ops:
+        await db.captcha_pending.bulk_write(ops, ordered=False)
+
+async def iter_captcha_pending():
+    async for doc in db.captcha_pending.find({}, {"_id": 0}):
+        yield doc
 
 # ==========================================================
 # 👮 ADMIN ACTION COUNTER (BAN + KICK)
 # ==========================================================
 ANTI_LIMIT_HOURS = 24
 
+@guarded
 async def add_admin_action(chat_id: int, admin_id: int) -> int:
     now = datetime.utcnow()
 
@@ -147,17 +627,333 @@ async def add_admin_action(chat_id: int, admin_id: int) -> int:
     )
     return new_count
 
+@replayable
 async def reset_admin(chat_id: int, admin_id: int):
     await db.admin_actions.delete_one(
         {"chat_id": chat_id, "admin_id": admin_id}
     )
 
+# ==========================================================
+# 💬 CHAT REGISTRY (chats the bot moderates)
+# ==========================================================
+@replayable
+async def touch_chat(chat_id: int, title: str):
+    await db.chats.update_one(
+        {"chat_id": chat_id},
+        {"$set": {"title": title, "last_seen": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def iter_chat_ids(seen_since: datetime = None):
+    query = {"last_seen": {"$gte": seen_since}} if seen_since else {}
+    async for doc in db.chats.find(query, {"_id": 0, "chat_id": 1}):
+        yield doc["chat_id"]
+
+# ==========================================================
+# 🌍 GLOBAL BANS
+# ==========================================================
+@replayable
+async def add_gban(user_id: int, reason: str, by: int):
+    now = datetime.utcnow()
+    await db.gbans.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {"active": True, "reason": reason, "by": by, "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True
+    )
+
+@guarded
+async def remove_gban(user_id: int) -> bool:
+    # Kept as a tombstone so other instances pick the removal up on sync
+    result = await db.gbans.update_one(
+        {"user_id": user_id, "active": True},
+        {"$set": {"active": False, "updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count > 0
+
+@guarded
+async def get_gban(user_id: int):
+    return await db.gbans.find_one({"user_id": user_id, "active": True})
+
+async def iter_gban_changes(since: datetime):
+    cursor = db.gbans.find(
+        {"updated_at": {"$gte": since}},
+        {"_id": 0, "user_id": 1, "active": 1, "updated_at": 1}
+    ).sort("updated_at", ASCENDING)
+    async for doc in cursor:
+        yield doc
+
+@guarded
+async def count_gbans() -> int:
+    return await db.gbans.count_documents({"active": True})
+
+# ==========================================================
+# 🌊 SPAM WAVE SKETCH CHECKPOINT
+# ==========================================================
+@guarded
+async def save_spam_sketch(width: int, depth: int, counters: bytes, decayed_at: float):
+    await db.spam_sketch.update_one(
+        {"_id": "global"},
+        {"$set": {"width": width, "depth": depth, "counters": counters, "decayed_at": decayed_at}},
+        upsert=True
+    )
+
+@guarded
+async def load_spam_sketch():
+    return await db.spam_sketch.find_one({"_id": "global"})
+
+# ==========================================================
+# 🔑 PYROGRAM SESSION (auth fields and peer cache snapshots)
+# ==========================================================
+@guarded
+async def save_session(name: str, fields: dict):
+    await db.sessions.replace_one({"_id": name}, {"_id": name, **fields}, upsert=True)
+
+@guarded
+async def save_session_peers(name: str, peers: list):
+    """Upsert (peer_id, access_hash, type, username, phone_number, updated) tuples."""
+    ops = [
+        ReplaceOne(
+            {"session": name, "peer_id": peer_id},
+            {"session": name, "peer_id": peer_id, "access_hash": access_hash, "type": peer_type,
+             "username": username, "phone_number": phone_number, "updated": updated},
+            upsert=True
+        )
+        for peer_id, access_hash, peer_type, username, phone_number, updated in peers
+    ]
+    if ops:
+        await db.session_peers.bulk_write(ops, ordered=False)
+
+@guarded
+async def load_session(name: str):
+    return await db.sessions.find_one({"_id": name})
+
+async def iter_session_peers(name: str):
+    async for doc in db.session_peers.find({"session": name}, {"_id": 0, "session": 0}):
+        yield doc
+
+@guarded
+async def delete_session(name: str):
+    await db.sessions.delete_one({"_id": name})
+    await db.session_peers.delete_many({"session": name})
+
+# ==========================================================
+# ⏳ SCHEDULED ACTIONS (timed mute / ban expirations)
+# ==========================================================
+@guarded
+async def add_scheduled_action(chat_id: int, user_id: int, action: str, due: datetime):
+    # One pending expiration per (chat, user, action); re-sanctioning replaces it
+    doc = await db.scheduled_actions.find_one_and_update(
+        {"chat_id": chat_id, "user_id": user_id, "action": action},
+        {"$set": {"due": due}, "$unset": {"attempts": ""}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        projection={"_id": 1}
+    )
+    return doc["_id"]
+
+@replayable
+async def remove_scheduled_action(chat_id: int, user_id: int, action: str):
+    await db.scheduled_actions.delete_one(
+        {"chat_id": chat_id, "user_id": user_id, "action": action}
+    )
+
+@guarded
+async def get_scheduled_actions(after: datetime, until: datetime, limit: int) -> list:
+    cursor = db.scheduled_actions.find(
+        {"due": {"$gte": after, "$lte": until}}
+    ).sort("due", ASCENDING).limit(limit)
+    return [doc async for doc in cursor]
+
+@guarded
+async def get_scheduled_actions_by_ids(ids: list) -> list:
+    cursor = db.scheduled_actions.find({"_id": {"$in": ids}})
+    return [doc async for doc in cursor]
+
+@guarded
+async def retry_scheduled_action(job_id, due: datetime, attempts: int):
+    await db.scheduled_actions.update_one(
+        {"_id": job_id},
+        {"$set": {"due": due, "attempts": attempts}}
+    )
+
+@replayable
+async def delete_scheduled_actions(ids: list):
+    await db.scheduled_actions.delete_many({"_id": {"$in": ids}})
+
+# ==========================================================
+# 📊 CHAT ACTIVITY (hourly pre-aggregated buckets)
+# ==========================================================
+@guarded
+async def inc_chat_stats(buckets: list):
+    # [(chat_id, bucket, {"counts.messages": 12, "users.42": 7, ...})]
+    await db.chat_stats.bulk_write([
+        UpdateOne({"chat_id": chat_id, "bucket": bucket}, {"$inc": inc}, upsert=True)
+        for chat_id, bucket, inc in buckets
+    ], ordered=False)
+
+@guarded
+async def get_chat_stats(chat_id: int, since: datetime) -> list:
+    cursor = db.chat_stats.find(
+        {"chat_id": chat_id, "bucket": {"$gte": since}},
+        {"_id": 0, "counts": 1, "users": 1}
+    )
+    return [doc async for doc in cursor]
+
+# ==========================================================
+# 📜 MODERATION AUDIT LOG (capped, append-only)
+# ==========================================================
+_modlog_ready = None   # task creating or capping the collection
+
+async def _cap_modlog():
+    try:
+        await db.create_collection("modlog", capped=True, size=MODLOG_CAPPED_BYTES)
+    except CollectionInvalid:
+        # Already there, maybe auto-created uncapped by an earlier insert
+        if not (await db.modlog.options()).get("capped"):
+            logger.warning("modlog is not capped, converting it")
+            await db.command("convertToCapped", "modlog", size=MODLOG_CAPPED_BYTES)
+
+async def ensure_modlog():
+    """Make sure modlog exists and is capped before anything is written to it."""
+    global _modlog_ready
+    failed = _modlog_ready and _modlog_ready.done() and (_modlog_ready.cancelled() or _modlog_ready.exception())
+    if _modlog_ready is None or failed:
+        _modlog_ready = asyncio.get_running_loop().create_task(_cap_modlog())
+    await asyncio.shield(_modlog_ready)
+
+@guarded
+async def insert_modlog(events: list):
+    await ensure_modlog()
+    try:
+        await db.modlog.insert_many(events, ordered=False)
+    except BulkWriteError as e:
+        # Retried batch: events that already made it in fail as duplicate _ids
+        if e.details.get("writeConcernErrors") or any(
+            err.get("code") != 11000 for err in e.details.get("writeErrors", [])
+        ):
+            raise
+
+@guarded
+async def get_modlog(chat_id: int, admin_id: int = None, before_id=None, limit: int = 25) -> list:
+    query = {"chat_id": chat_id}
+    if admin_id:
+        query["admin_id"] = admin_id
+    if before_id:
+        query["_id"] = {"$lt": before_id}
+    cursor = db.modlog.find(query).sort("_id", DESCENDING).limit(limit)
+    return [doc async for doc in cursor]
+
+async def iter_modlog(chat_id: int):
+    cursor = db.modlog.find({"chat_id": chat_id}, {"_id": 0}).sort("_id", ASCENDING).batch_size(1000)
+    async for doc in cursor:
+        yield doc
+
 # ==========================================================
 # 🧹 CLEANUP (Optional)
 # ==========================================================
+# Every per-chat collection, chats last so a partial purge is found and
+# retried. modlog is capped: documents cannot be deleted from it and it
+# ages out on its own.
+CHAT_COLLECTIONS = (
+    "welcome", "locks", "warns", "warnings", "warn_settings", "anticheater_settings",
+    "admin_actions", "scheduled_actions", "chat_stats", "captcha_settings",
+    "captcha_pending", "chat_presets", "chats",
+)
+
+# users last: it is what finds dead users, so a partial purge is retried
+USER_COLLECTIONS = ("user_index", "users")
+
+def forget_chats(chat_ids: list):
+    for chat_id in chat_ids:
+        for collection in SETTINGS_COLLECTIONS:
+            _settings_cache.pop((collection, chat_id), None)
+            _merged_cache.pop((collection, chat_id), None)
+
+# Not guarded: the compactor runs these under its own, longer timeout so
+# a slow batch never counts against the breaker live traffic depends on
+async def delete_chat_docs(collection: str, chat_ids: list) -> int:
+    result = await db[collection].delete_many({"chat_id": {"$in": chat_ids}})
+    return result.deleted_count
+
+async def delete_user_docs(collection: str, user_ids: list) -> int:
+    result = await db[collection].delete_many({"user_id": {"$in": user_ids}})
+    return result.deleted_count
+
+@replayable
 async def clear_group_data(chat_id: int):
-    await db.welcome.delete_one({"chat_id": chat_id})
-    await db.locks.delete_one({"chat_id": chat_id})
-    await db.warns.delete_many({"chat_id": chat_id})
-    await db.anticheater_settings.delete_one({"chat_id": chat_id})
-    await db.admin_actions.delete_many({"chat_id": chat_id})
+    forget_chats([chat_id])
+    for collection in CHAT_COLLECTIONS:
+        await delete_chat_docs(collection, [chat_id])
+
+@guarded
+async def get_dormant_chats(seen_before: datetime, limit: int) -> list:
+    cursor = db.chats.find(
+        {"last_seen": {"$lt": seen_before}},
+        {"_id": 0, "chat_id": 1}
+    ).sort("last_seen", ASCENDING).limit(limit)
+    return [doc["chat_id"] async for doc in cursor]
+
+@guarded
+async def mark_chats_seen(chat_ids: list):
+    await db.chats.update_many(
+        {"chat_id": {"$in": chat_ids}},
+        {"$set": {"last_seen": datetime.utcnow()}}
+    )
+
+@guarded
+async def mark_users_blocked(user_ids: list):
+    await db.users.update_many(
+        {"user_id": {"$in": user_ids}, "blocked_at": {"$exists": False}},
+        {"$set": {"blocked_at": datetime.utcnow()}}
+    )
+
+@guarded
+async def get_dead_users(blocked_before: datetime, limit: int) -> list:
+    cursor = db.users.find(
+        {"blocked_at": {"$lt": blocked_before}},
+        {"_id": 0, "user_id": 1}
+    ).sort("blocked_at", ASCENDING).limit(limit)
+    return [doc["user_id"] async for doc in cursor]
+
+@guarded
+async def avg_object_sizes(collections) -> dict:
+    sizes = {}
+    for collection in collections:
+        try:
+            stats = await db.command("collStats", collection)
+            sizes[collection] = stats.get("avgObjSize", 0)
+        except PyMongoError:
+            sizes[collection] = 0
+    return sizes
+
+# ==========================================================
+# 📇 INDEXES
+# ==========================================================
+async def ensure_indexes():
+    await ensure_modlog()
+    await db.modlog.create_index([("chat_id", ASCENDING), ("_id", DESCENDING)])
+    await db.modlog.create_index([("chat_id", ASCENDING), ("admin_id", ASCENDING), ("_id", DESCENDING)])
+
+    await db.user_index.create_index([("user_id", ASCENDING)], unique=True)
+    await db.user_index.create_index([("username", ASCENDING)], sparse=True)
+    await db.scheduled_actions.create_index([("due", ASCENDING)])
+    await db.scheduled_actions.create_index(
+        [("chat_id", ASCENDING), ("user_id", ASCENDING), ("action", ASCENDING)], unique=True
+    )
+    await db.warnings.create_index([("chat_id", ASCENDING), ("user_id", ASCENDING), ("_id", DESCENDING)])
+    await db.warnings.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    await db.chats.create_index([("chat_id", ASCENDING)], unique=True)
+    await db.chats.create_index([("last_seen", ASCENDING)])
+    await db.users.create_index([("blocked_at", ASCENDING)], sparse=True)
+    await db.gbans.create_index([("user_id", ASCENDING)], unique=True)
+    await db.gbans.create_index([("updated_at", ASCENDING)])
+    await db.chat_stats.create_index([("chat_id", ASCENDING), ("bucket", ASCENDING)], unique=True)
+    await db.captcha_pending.create_index([("chat_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+    await db.presets.create_index([("name", ASCENDING)], unique=True)
+    await db.chat_presets.create_index([("chat_id", ASCENDING)], unique=True)
+    await db.chat_presets.create_index([("preset", ASCENDING)])
+    await db.session_peers.create_index([("session", ASCENDING), ("peer_id", ASCENDING)], unique=True)
+    await db.chat_stats.create_index([("bucket", ASCENDING)], expireAfterSeconds=STATS_RETENTION_DAYS * 86400)
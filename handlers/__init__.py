@@ -1,7 +1,27 @@
+import logging
 from .start import register_handlers
 from .group_commands import register_group_commands
+from .gate import register_gate
+from .tracker import register_tracker
+from .gban import register_gban
+from .modlog import register_modlog
+from .chatstats import register_chatstats
+from .captcha import register_captcha
+from .presets import register_presets
+from utils.commands import router
+
+logger = logging.getLogger(__name__)
 
 def register_all_handlers(app):
+    register_gate(app)
+    register_tracker(app)
+    register_gban(app)
     register_handlers(app)
     register_group_commands(app)
-    print("✅ Group commands registered!")
+    register_modlog(app)
+    register_chatstats(app)
+    register_captcha(app)
+    register_presets(app)
+    # One handler for every command declared above
+    router.attach(app)
+    logger.info("✅ Group commands registered!")
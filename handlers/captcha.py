@@ -0,0 +1,189 @@
+import logging
+import random
+from pyrogram import Client, filters
+from pyrogram.types import (
+    Message,
+    CallbackQuery,
+    ChatPermissions,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+)
+import db
+from utils.admin_cache import admin_cache
+from utils.audit import audit
+from utils.bot_perms import bot_perms
+from utils.captcha import captcha
+from utils.catchup import catchup
+from utils.chat_stats import chat_stats
+from utils.commands import router, CommandContext
+from utils.durations import parse_duration, format_duration
+from utils.ratelimit import call_with_floodwait
+from utils.scheduler import UNMUTE_PERMISSIONS
+from .group_commands import handle_welcome
+
+logger = logging.getLogger(__name__)
+
+# After global bans (-10) so banned users are never challenged, before
+# the group 0 welcome, and ahead of every regex callback handler
+CAPTCHA_GROUP = -5
+
+CALLBACK_PREFIX = "cap:"
+MATH_OPTIONS = 4
+
+
+async def _is_captcha_callback(_, __, callback_query: CallbackQuery) -> bool:
+    return bool(callback_query.data) and callback_query.data.startswith(CALLBACK_PREFIX)
+
+captcha_callback = filters.create(_is_captcha_callback)
+
+
+def make_challenge(mode: str, user_id: int) -> tuple:
+    """(question, keyboard, answer); answer 0 means any press passes."""
+    if mode == "button":
+        keyboard = [[InlineKeyboardButton("✅ I'm human", callback_data=f"{CALLBACK_PREFIX}{user_id}:0")]]
+        return "press the button below", InlineKeyboardMarkup(keyboard), 0
+
+    a, b = random.randint(1, 9), random.randint(1, 9)
+    answer = a + b
+    options = {answer}
+    while len(options) < MATH_OPTIONS:
+        options.add(random.randint(2, 18))
+    options = random.sample(sorted(options), len(options))
+    keyboard = [[
+        InlineKeyboardButton(str(n), callback_data=f"{CALLBACK_PREFIX}{user_id}:{n}") for n in options
+    ]]
+    return f"solve **{a} + {b}**", InlineKeyboardMarkup(keyboard), answer
+
+
+def register_captcha(app: Client):
+
+    async def challenge(client, message: Message, user, settings: dict):
+        chat_id = message.chat.id
+        try:
+            await call_with_floodwait(
+                client.restrict_chat_member, chat_id, user.id, ChatPermissions(can_send_messages=False)
+            )
+        except Exception as e:
+            logger.error(f"Captcha restrict failed in {chat_id}: {e}")
+            return False
+
+        question, keyboard, answer = make_challenge(settings["mode"], user.id)
+        try:
+            sent = await call_with_floodwait(
+                client.send_message,
+                chat_id,
+                f"🧩 {user.mention}, {question} within {format_duration(settings['timeout'])} "
+                f"to start chatting.",
+                reply_markup=keyboard,
+            )
+        except Exception as e:
+            logger.error(f"Captcha challenge failed in {chat_id}: {e}")
+            sent = None
+
+        captcha.add(chat_id, user.id, answer, sent.id if sent else 0, settings["timeout"])
+        return True
+
+# ==========================================================
+# joins: restrict and challenge instead of welcoming
+# ==========================================================
+    @app.on_message(filters.group & filters.new_chat_members, group=CAPTCHA_GROUP)
+    async def captcha_join(client, message: Message):
+        chat_id = message.chat.id
+        settings = await db.get_captcha_settings(chat_id)
+        if settings["mode"] == "off":
+            return
+        # Joined while we were down: no challenge and no welcome this late
+        if catchup.skip(message, "captchas"):
+            message.stop_propagation()
+
+        if not await bot_perms.can(client, chat_id, "can_restrict_members"):
+            if bot_perms.first_notice(chat_id, "can_restrict_members"):
+                await message.reply_text(
+                    "⚠️ Captcha is paused: I need the 'Ban Users' admin right to restrict new members."
+                )
+            return
+
+        # Members added by an admin are trusted
+        if message.from_user and await admin_cache.is_admin(client, chat_id, message.from_user.id):
+            return
+
+        passed = []
+        for user in message.new_chat_members:
+            if user.is_bot or not await challenge(client, message, user, settings):
+                passed.append(user)
+
+        if passed:
+            await handle_welcome(client, chat_id, passed, message.chat.title)
+        # Everyone else is welcomed once they pass
+        message.stop_propagation()
+
+# ==========================================================
+# answers: one prefix check, no regex scan over other routes
+# ==========================================================
+    @app.on_callback_query(captcha_callback, group=CAPTCHA_GROUP)
+    async def captcha_answer(client, callback_query: CallbackQuery):
+        await resolve_answer(client, callback_query)
+        callback_query.stop_propagation()
+
+    async def resolve_answer(client, callback_query: CallbackQuery):
+        _, user_id, value = callback_query.data.split(":")
+        user_id = int(user_id)
+        message = callback_query.message
+        chat_id = message.chat.id
+
+        if callback_query.from_user.id != user_id:
+            return await callback_query.answer("This check is for someone else.", show_alert=True)
+        if not captcha.loaded:
+            return await callback_query.answer("⏳ Starting up, try again in a few seconds.")
+
+        entry = captcha.pop(chat_id, user_id)
+        if entry is None:
+            return await callback_query.answer("This check has expired.", show_alert=True)
+
+        _, answer, _ = entry
+        try:
+            if answer and int(value) != answer:
+                await client.ban_chat_member(chat_id, user_id)
+                await client.unban_chat_member(chat_id, user_id)
+                chat_stats.record(chat_id, "captcha_kicks")
+                audit.record(chat_id, "captcha_fail", None, user_id)
+                await callback_query.answer("❌ Wrong answer.", show_alert=True)
+            else:
+                await client.restrict_chat_member(chat_id, user_id, permissions=UNMUTE_PERMISSIONS)
+                chat_stats.record(chat_id, "captcha_passes")
+                await callback_query.answer("✅ Verified, welcome!")
+                await handle_welcome(client, chat_id, [callback_query.from_user], message.chat.title)
+        except Exception as e:
+            logger.error(f"Captcha result failed in {chat_id}: {e}")
+
+        try:
+            await message.delete()
+        except Exception:
+            pass
+
+# ==========================================================
+# /captcha off | button | math | timeout 5m
+# ==========================================================
+    @router.command("captcha")
+    async def captcha_command(ctx: CommandContext):
+        words = [word.lower() for word in ctx.words]
+        if not words:
+            settings = await db.get_captcha_settings(ctx.chat_id)
+            return await ctx.reply(
+                f"🧩 **Join captcha**\n\n"
+                f"• Mode: {settings['mode']}\n"
+                f"• Timeout: {format_duration(settings['timeout'])}\n\n"
+                "⚙️ /captcha off | button | math | timeout <30s-1h>"
+            )
+
+        if words[0] in db.CAPTCHA_MODES and len(words) == 1:
+            await db.set_captcha(ctx.chat_id, mode=words[0])
+            return await ctx.reply(f"🧩 Captcha set to {words[0]}.")
+
+        if words[0] == "timeout" and len(words) == 2:
+            seconds = parse_duration(words[1])
+            if seconds and 30 <= seconds <= captcha.max_timeout:
+                await db.set_captcha(ctx.chat_id, timeout=seconds)
+                return await ctx.reply(f"🧩 Captcha timeout set to {format_duration(seconds)}.")
+
+        await ctx.reply("⚙️ Usage: /captcha off | button | math | timeout <30s-1h>")
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from pyrogram import Client
+from config import STATS_RETENTION_DAYS
+from utils.chat_stats import chat_stats
+from utils.commands import router, CommandContext, duration, optional
+from utils.durations import format_duration
+from utils.user_cache import user_cache
+
+STATS_DEFAULT_WINDOW = 86400
+STATS_TOP_SHOWN = 5
+
+DELETION_LABELS = {
+    "deleted_url": "links",
+    "deleted_sticker": "stickers",
+    "deleted_media": "media",
+    "deleted_username": "usernames",
+    "deleted_forward": "forwards",
+    "deleted_language": "language",
+    "deleted_spam": "spam waves",
+}
+
+
+def register_chatstats(app: Client):
+
+    async def describe_user(client, user_id: str) -> str:
+        user = await user_cache.resolve(client, user_id)
+        return user.mention if user else f"`{user_id}`"
+
+# ==========================================================
+# /chatstats [24h|7d|30d]
+# ==========================================================
+    @router.command("chatstats", args=(optional(duration),), skip_stale=True,
+                    usage="⚠️ Usage: /chatstats [24h|7d|30d]")
+    async def chatstats_command(ctx: CommandContext):
+        window = min(ctx.args[0] or STATS_DEFAULT_WINDOW, STATS_RETENTION_DAYS * 86400)
+        since = chat_stats.bucket(datetime.utcnow() - timedelta(seconds=window))
+        totals, users = await chat_stats.summary(ctx.chat_id, since)
+        if not totals:
+            return await ctx.reply("🤖 No activity recorded for this period yet.")
+
+        deleted = {label: totals[field] for field, label in DELETION_LABELS.items() if totals[field]}
+        lines = [
+            f"📊 **Chat stats — last {format_duration(window)}**\n",
+            f"• Messages: {totals['messages']}",
+            f"• Joins: {totals['joins']}",
+            f"• Warns: {totals['warns']}",
+            f"• Bans: {totals['bans']}",
+            f"• Deleted by the bot: {sum(deleted.values())}",
+        ]
+        lines += [f"   ◦ {label}: {count}" for label, count in deleted.items()]
+
+        top = users.most_common(STATS_TOP_SHOWN)
+        if top:
+            lines.append("\n🏆 **Most active**")
+            for rank, (user_id, count) in enumerate(top, 1):
+                lines.append(f"{rank}. {await describe_user(ctx.client, user_id)} — {count}")
+        await ctx.reply("\n".join(lines))
@@ -0,0 +1,20 @@
+from pyrogram import Client, StopPropagation
+from utils.lifecycle import lifecycle
+from utils.catchup import catchup
+from utils.logs import bind_update
+
+# First handler group: nothing runs once intake is stopped
+GATE_GROUP = -100
+
+
+def register_gate(app: Client):
+
+    @app.on_message(group=GATE_GROUP)
+    @app.on_callback_query(group=GATE_GROUP)
+    @app.on_chat_member_updated(group=GATE_GROUP)
+    async def gate(client, update):
+        # Every log record written while handling this update carries its trace
+        bind_update(update)
+        catchup.observe(update)
+        if not lifecycle.accepting:
+            raise StopPropagation
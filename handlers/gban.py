@@ -0,0 +1,108 @@
+import logging
+from pyrogram import Client, filters
+from pyrogram.types import Message, ChatMemberUpdated
+from pyrogram.enums import ChatMemberStatus
+from config import OWNER_ID
+import db
+from utils.audit import audit
+from utils.bot_perms import bot_perms
+from utils.catchup import catchup
+from utils.chat_stats import chat_stats
+from utils.gban import gban_index
+from utils.lifecycle import lifecycle
+from utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# After the identity tracker, before commands and locks
+GBAN_GROUP = -10
+
+
+def register_gban(app: Client):
+
+    async def extract_gban_target(client, message):
+        if message.reply_to_message:
+            parts = message.text.split(maxsplit=1)
+            return message.reply_to_message.from_user, (parts[1] if len(parts) > 1 else None)
+
+        parts = message.text.split(maxsplit=2)
+        if len(parts) < 2:
+            return None, None
+        user = await user_cache.resolve(client, parts[1])
+        return user, (parts[2] if len(parts) > 2 else None)
+
+    async def run_fan_out(client, message, user, ban: bool):
+        done, failed = await gban_index.fan_out(client, user.id, ban)
+        verb = "banned in" if ban else "unbanned in"
+        await message.reply_text(f"🌍 {user.mention} {verb} {done} chats ({failed} failed).")
+
+# ==========================================================
+# /gban (bot owner)
+# ==========================================================
+    @app.on_message(filters.command("gban") & filters.user(OWNER_ID))
+    async def gban_command(client, message: Message):
+        user, reason = await extract_gban_target(client, message)
+        if not user:
+            return await message.reply_text("⚠️ Usage: Reply or use `/gban @username [reason]`")
+        if user.id == OWNER_ID or user.is_self:
+            return await message.reply_text("❌ That user cannot be globally banned.")
+
+        await db.add_gban(user.id, reason, message.from_user.id)
+        gban_index.add(user.id)
+        audit.record(message.chat.id, "gban", message.from_user.id, user.id, reason)
+        await message.reply_text(f"🌍 {user.mention} globally banned. Applying to all chats...")
+
+        lifecycle.spawn(run_fan_out(client, message, user, True))
+
+# ==========================================================
+# /ungban (bot owner)
+# ==========================================================
+    @app.on_message(filters.command("ungban") & filters.user(OWNER_ID))
+    async def ungban_command(client, message: Message):
+        user, _ = await extract_gban_target(client, message)
+        if not user:
+            return await message.reply_text("⚠️ Usage: Reply or use `/ungban @username`")
+
+        if not await db.remove_gban(user.id):
+            return await message.reply_text(f"🤖 {user.mention} is not globally banned.")
+
+        gban_index.discard(user.id)
+        audit.record(message.chat.id, "ungban", message.from_user.id, user.id)
+        await message.reply_text(f"✅ {user.mention} removed from the global ban list. Lifting in all chats...")
+
+        lifecycle.spawn(run_fan_out(client, message, user, False))
+
+# ==========================================================
+# enforce on every message and join
+# ==========================================================
+    async def enforce_gban(client, chat_id: int, user) -> bool:
+        if not user or not await gban_index.is_banned(user.id):
+            return False
+        if not await bot_perms.can(client, chat_id, "can_restrict_members"):
+            return False
+        try:
+            await client.ban_chat_member(chat_id, user.id)
+            chat_stats.record(chat_id, "bans")
+        except Exception as e:
+            logger.error(f"Global ban enforcement failed in {chat_id}: {e}")
+        return True
+
+    @app.on_message(filters.group, group=GBAN_GROUP)
+    async def gban_message(client, message: Message):
+        banned = await enforce_gban(client, message.chat.id, message.from_user)
+        for user in message.new_chat_members or ():
+            banned = await enforce_gban(client, message.chat.id, user) or banned
+
+        if banned:
+            try:
+                await catchup.delete(client, message)
+            except Exception:
+                pass
+            message.stop_propagation()
+
+    @app.on_chat_member_updated(filters.group, group=GBAN_GROUP)
+    async def gban_join(client, cmu: ChatMemberUpdated):
+        new = cmu.new_chat_member
+        if not new or new.status not in (ChatMemberStatus.MEMBER, ChatMemberStatus.RESTRICTED):
+            return
+        await enforce_gban(client, cmu.chat.id, new.user)
@@ -1,42 +1,95 @@
 import logging
+import time
 from pyrogram import Client, filters
-from pyrogram.types import Message, ChatMemberUpdated, ChatPermissions, ChatPrivileges
+from pyrogram.types import (
+    Message,
+    CallbackQuery,
+    ChatMemberUpdated,
+    ChatPermissions,
+    ChatPrivileges,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+)
 from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+from pyrogram.utils import zero_datetime
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from config import MODERATION_CONCURRENCY, PURGE_CONCURRENCY, PURGE_MAX_SPAN
 import db
+from utils.admin_cache import admin_cache
+from utils.audit import audit
+from utils.bot_perms import bot_perms
+from utils.catchup import catchup
+from utils.chat_stats import chat_stats
+from utils.commands import (
+    router,
+    CommandContext,
+    ROLE_MEMBER,
+    ROLE_OWNER,
+    TARGET_ONE,
+    TARGET_MANY,
+    choice,
+    duration,
+    free_text,
+    optional,
+)
+from utils.durations import parse_duration, format_duration
+from utils.executor import BatchExecutor
+from utils.scheduler import scheduler, telegram_can_expire, UNMUTE_PERMISSIONS
+from utils.scripts import SCRIPTS
+from utils.settings_engine import engines
+from utils.spam_sketch import spam_detector
 
 DEFAULT_WELCOME = "👋 Welcome {first_name} to {title}!"
 ADMIN_LIMIT = 10
+LOCK_TYPES = ("url", "sticker", "media", "username", "forward", "language")
+
+# Telegram's delete_messages limit per call
+PURGE_CHUNK = 100
+PURGE_PROGRESS_INTERVAL = 2
+
+moderation_executor = BatchExecutor(MODERATION_CONCURRENCY)
+purge_executor = BatchExecutor(PURGE_CONCURRENCY)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 
-def register_group_commands(app: Client):
+async def handle_welcome(client, chat_id: int, users: list, chat_title: str):
+    engine = await engines.get(chat_id)
+    if not engine.welcome_enabled:
+        return
+
+    welcome_text = engine.welcome or DEFAULT_WELCOME
+
+    for user in users:
+        try:
+            text = welcome_text.format(
+                username=user.username or user.first_name,
+                first_name=user.first_name,
+                mention=user.mention,
+                title=chat_title,
+            )
+        except KeyError:
+            text = DEFAULT_WELCOME.format(first_name=user.first_name, title=chat_title)
+        try:
+            await client.send_message(chat_id, text)
+        except Exception as e:
+            logger.error(f"🚨 Failed to send welcome message: {e}")
 
-    async def is_admin(client, chat_id, user_id):
-        member = await client.get_chat_member(chat_id, user_id)
-        return member.status in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER)
 
-    async def is_owner(client, chat_id, user_id):
-        member = await client.get_chat_member(chat_id, user_id)
-        return member.status == ChatMemberStatus.OWNER
+def register_group_commands(app: Client):
 
 # ==========================================================
 # 👮 ANTI-CHEATER TOGGLE (OWNER ONLY)
 # ==========================================================
-    @app.on_message(filters.group & filters.command("anticheater"))
-    async def anticheater_toggle(client, message: Message):
-        if not await is_owner(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only group owner can use this command.")
-
-        args = message.text.split()
-        if len(args) != 2 or args[1] not in ("on", "off"):
-            return await message.reply_text("Usage: /anticheater on | off")
+    @router.command("anticheater", role=ROLE_OWNER, args=(choice("on", "off"),),
+                    usage="Usage: /anticheater on | off")
+    async def anticheater_toggle(ctx: CommandContext):
+        status = ctx.args[0] == "on"
+        await db.set_anticheater(ctx.chat_id, status)
 
-        status = args[1] == "on"
-        await db.set_anticheater(message.chat.id, status)
-
-        await message.reply_text(
+        await ctx.reply(
             "🛡️ Anti-Cheater ENABLED" if status else "⚠️ Anti-Cheater DISABLED"
         )
 
@@ -52,7 +105,7 @@ def register_group_commands(app: Client):
 
             chat_id = cmu.chat.id
 
-            if not await db.get_anticheater(chat_id):
+            if not (await engines.get(chat_id)).anticheater:
                 return
 
             admin = cmu.from_user
@@ -64,8 +117,7 @@ def register_group_commands(app: Client):
                 return
 
             # Ignore owner completely
-            admin_status = await client.get_chat_member(chat_id, admin.id)
-            if admin_status.status == ChatMemberStatus.OWNER:
+            if await admin_cache.is_owner(client, chat_id, admin.id):
                 return
 
             # ❌ IGNORE SELF-LEAVE
@@ -99,6 +151,10 @@ def register_group_commands(app: Client):
             count = await db.add_admin_action(chat_id, admin.id)
 
             if count > ADMIN_LIMIT:
+                if not await bot_perms.can(client, chat_id, "can_promote_members"):
+                    logger.warning(f"Anti-Cheater: cannot demote in {chat_id}, missing 'Add New Admins'")
+                    return
+
                 await client.promote_chat_member(
                     chat_id,
                     admin.id,
@@ -125,6 +181,7 @@ def register_group_commands(app: Client):
                 )
 
                 await db.reset_admin(chat_id, admin.id)
+                audit.record(chat_id, "anticheater_demote", None, admin.id, f"{count} actions in {db.ANTI_LIMIT_HOURS}h")
 
         except Exception as e:
             logger.error(f"Anti-Cheater Error: {e}")
@@ -133,8 +190,11 @@ def register_group_commands(app: Client):
     # WELCOME SYSTEM
     # ==========================================================
 
+    # With captcha on, handlers/captcha.py stops joins first and welcomes on pass
     @app.on_message(filters.new_chat_members)
     async def send_welcome(client, message: Message):
+        if catchup.skip(message, "welcomes"):
+            return
         await handle_welcome(
             client,
             message.chat.id,
@@ -142,401 +202,549 @@ def register_group_commands(app: Client):
             message.chat.title,
         )
 
-    @app.on_chat_member_updated()
-    async def member_update(client, cmu: ChatMemberUpdated):
-        if not cmu.old_chat_member or not cmu.new_chat_member:
-            return
-
-        old_status = cmu.old_chat_member.status
-        new_status = cmu.new_chat_member.status
-
-        if old_status in [ChatMemberStatus.LEFT, ChatMemberStatus.RESTRICTED] \
-           and new_status == ChatMemberStatus.MEMBER:
-            await handle_welcome(
-                client,
-                cmu.chat.id,
-                [cmu.new_chat_member.user],
-                cmu.chat.title,
-            )
-
 # ==========================================================
 # power logic
 # ==========================================================
     async def is_power(client, chat_id: int, user_id: int) -> bool:
-        member = await client.get_chat_member(chat_id, user_id)
-        return member.status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER]
+        return await admin_cache.is_admin(client, chat_id, user_id)
 
 # ==========================================================
 # on/off welcome
 # ==========================================================
-    @app.on_message(filters.group & filters.command("welcome"))
-    async def welcome_toggle(client, message: Message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only group admin or owner can use this command.")
-
-        parts = message.text.split(maxsplit=1)
-        if len(parts) < 2 or parts[1].lower() not in ["on", "off"]:
-            return await message.reply_text("⚙️ Usage: /welcome on/off")
-
-        status = parts[1].lower() == "on"
-        await db.set_welcome_status(message.chat.id, status)
+    @router.command("welcome", args=(choice("on", "off"),), usage="⚙️ Usage: /welcome on/off")
+    async def welcome_toggle(ctx: CommandContext):
+        status = ctx.args[0] == "on"
+        await db.set_welcome_status(ctx.chat_id, status)
         msg = "✅ Welcome messages ON." if status else "⚠️ Welcome messages OFF."
-        await message.reply_text(msg)
+        await ctx.reply(msg)
 
 # ==========================================================
 # custom welcome
 # ==========================================================
-    @app.on_message(filters.group & filters.command("setwelcome"))
-    async def set_welcome(client, message: Message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("⚠️ Only admin or owner can use this command.")
-
-        parts = message.text.split(maxsplit=1)
-        if len(parts) < 2:
-            return await message.reply_text("🤖 Usage: /setwelcome <your_message>")
+    @router.command("setwelcome", args=(free_text,), usage="🤖 Usage: /setwelcome <your_message>")
+    async def set_welcome(ctx: CommandContext):
+        await db.set_welcome_message(ctx.chat_id, ctx.args[0])
+        await ctx.reply("✅ Custom welcome message saved!")
 
-        await db.set_welcome_message(message.chat.id, parts[1])
-        await message.reply_text("✅ Custom welcome message saved!")
-
-    async def handle_welcome(client, chat_id: int, users: list, chat_title: str):
-        status = await db.get_welcome_status(chat_id)
-        if not status:
-            return
-
-        welcome_text = await db.get_welcome_message(chat_id) or DEFAULT_WELCOME
-
-        for user in users:
-            try:
-                text = welcome_text.format(
-                    username=user.username or user.first_name,
-                    first_name=user.first_name,
-                    mention=user.mention,
-                    title=chat_title,
-                )
-            except KeyError:
-                text = DEFAULT_WELCOME.format(first_name=user.first_name, title=chat_title)
-            try:
-                await client.send_message(chat_id, text)
-            except Exception as e:
-                logger.error(f"🚨 Failed to send welcome message: {e}")
 
 # ==========================================================
 #  lock system
 # ==========================================================
 
-    @app.on_message(filters.group & filters.command("lock"))
-    async def lock_command(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        parts = message.text.split(maxsplit=1)
-        if len(parts) < 2:
-            return await message.reply_text("⚙️ Usage: /lock <url|sticker|media|username|forward>")
-
-        lock_type = parts[1].lower()
-        valid_locks = ["url", "sticker", "media", "username", "forward"]
-
-        if lock_type not in valid_locks:
-            return await message.reply_text(f"⚠️ Invalid lock type.\nAvailable: {', '.join(valid_locks)}")
-
-        await db.set_lock(message.chat.id, lock_type, True)
-        await message.reply_text(f"🔒 {lock_type.capitalize()} locked successfully!")
+    @router.command("lock", args=(choice(*LOCK_TYPES),), usage=f"⚙️ Usage: /lock <{'|'.join(LOCK_TYPES)}>")
+    async def lock_command(ctx: CommandContext):
+        lock_type = ctx.args[0]
+        await db.set_lock(ctx.chat_id, lock_type, True)
+        await ctx.reply(f"🔒 {lock_type.capitalize()} locked successfully!")
 
 # ==========================================================
 # unlock
 # ==========================================================
-    @app.on_message(filters.group & filters.command("unlock"))
-    async def unlock_command(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        parts = message.text.split(maxsplit=1)
-        if len(parts) < 2:
-            return await message.reply_text("⚙️ Usage: /unlock <url|sticker|media|username|forward>")
-
-        lock_type = parts[1].lower()
-        valid_locks = ["url", "sticker", "media", "username", "forward"]
-
-        if lock_type not in valid_locks:
-            return await message.reply_text(f"⚠️ Invalid lock type.\nAvailable: {', '.join(valid_locks)}")
-
-        await db.set_lock(message.chat.id, lock_type, False)
-        await message.reply_text(f"🔓 {lock_type.capitalize()} unlocked successfully!")
+    @router.command("unlock", args=(choice(*LOCK_TYPES),), usage=f"⚙️ Usage: /unlock <{'|'.join(LOCK_TYPES)}>")
+    async def unlock_command(ctx: CommandContext):
+        lock_type = ctx.args[0]
+        await db.set_lock(ctx.chat_id, lock_type, False)
+        await ctx.reply(f"🔓 {lock_type.capitalize()} unlocked successfully!")
 
 
 # ==========================================================
 # locks
 # ==========================================================
-    @app.on_message(filters.group & filters.command("locks"))
-    async def locks_list(client, message):
-        locks = await db.get_locks(message.chat.id)
+    @router.command("locks", role=ROLE_MEMBER, skip_stale=True)
+    async def locks_list(ctx: CommandContext):
+        locks = await db.get_locks(ctx.chat_id)
         if not locks:
-            return await message.reply_text("🤖 No active locks in this chat.")
+            return await ctx.reply("🤖 No active locks in this chat.")
 
         text = "🔐 **Current Locks:**\n\n"
         for lock_type, status in locks.items():
             state = "✅ ON" if status else "❌ OFF"
             text += f"• {lock_type.capitalize()}: {state}\n"
-        await message.reply_text(text)
+        await ctx.reply(text)
 
 
+# ==========================================================
+# language lock settings
+# ==========================================================
+    @router.command("langlock")
+    async def langlock_command(ctx: CommandContext):
+        chat_id = ctx.chat_id
+        parts = [ctx.command] + ctx.text.lower().split()
+        usage = (
+            "⚙️ Usage:\n"
+            "/langlock allow <scripts> : Only these scripts are allowed\n"
+            "/langlock deny <scripts>  : These scripts are blocked\n"
+            "/langlock threshold <0.05-0.95> : Blocked share of letters needed to delete\n\n"
+            f"Scripts: {', '.join(sorted(SCRIPTS))}"
+        )
+
+        if len(parts) == 1:
+            lang = await db.get_language_lock(chat_id)
+            return await ctx.reply(
+                f"🔤 **Language lock**\n\n"
+                f"• Mode: {lang['mode']}\n"
+                f"• Scripts: {', '.join(lang['scripts']) or 'none'}\n"
+                f"• Threshold: {lang['threshold']}\n\n{usage}"
+            )
+
+        if parts[1] in ("allow", "deny") and len(parts) > 2:
+            scripts = sorted(set(parts[2:]))
+            unknown = [name for name in scripts if name not in SCRIPTS]
+            if unknown:
+                return await ctx.reply(f"⚠️ Unknown script: {', '.join(unknown)}\n\n{usage}")
+            await db.set_language_lock(chat_id, mode=parts[1], scripts=scripts)
+            return await ctx.reply(f"🔤 Language lock will {parts[1]}: {', '.join(scripts)}")
+
+        if parts[1] == "threshold" and len(parts) == 3:
+            try:
+                threshold = float(parts[2])
+            except ValueError:
+                threshold = None
+            if threshold is None or not 0.05 <= threshold <= 0.95:
+                return await ctx.reply(usage)
+            await db.set_language_lock(chat_id, threshold=threshold)
+            return await ctx.reply(f"🔤 Language lock threshold set to {threshold}")
+
+        await ctx.reply(usage)
+
 # ==========================================================
 # handle all locks
 # ==========================================================
+    async def delete_wave(client, wave: dict):
+        for chat_id, message_ids in wave.items():
+            if not await bot_perms.can(client, chat_id, "can_delete_messages"):
+                continue
+            try:
+                await client.delete_messages(chat_id, message_ids)
+                chat_stats.record(chat_id, "deleted_spam", len(message_ids))
+            except Exception as e:
+                logger.error(f"Failed to delete spam wave in {chat_id}: {e}")
+
+    # ==== locks pause (with a single notice) while the bot cannot delete
+    async def can_enforce(client, message) -> bool:
+        chat_id = message.chat.id
+        if await bot_perms.can(client, chat_id, "can_delete_messages"):
+            return True
+        if not catchup.is_stale(message) and bot_perms.first_notice(chat_id, "can_delete_messages"):
+            try:
+                await client.send_message(
+                    chat_id,
+                    "⚠️ Locks are paused: I need the 'Delete Messages' admin right to enforce them.\n"
+                    "They resume automatically once it is granted."
+                )
+            except Exception as e:
+                logger.error(f"Failed to send missing-rights notice in {chat_id}: {e}")
+        return False
+
     @app.on_message(filters.group & ~filters.service, group=1)
     async def enforce_locks(client, message):
         try:
-            member = await client.get_chat_member(message.chat.id, message.from_user.id)
-            if member.status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER]:
+            if await admin_cache.is_admin(client, message.chat.id, message.from_user.id):
                 return
         except:
             return
 
-        locks = await db.get_locks(message.chat.id)
-        if not locks:
+        wave = spam_detector.observe(message)
+        if wave:
+            await delete_wave(client, wave)
+            return
+
+        engine = await engines.get(message.chat.id)
+        if not engine.locks:
+            return
+
+        if not await can_enforce(client, message):
             return
 
-        if locks.get("url") and message.text:
+        violated = violated_lock(message, engine)
+        if violated:
+            await catchup.delete(client, message)
+            chat_stats.record(message.chat.id, f"deleted_{violated}")
+
+    def violated_lock(message, engine):
+        locks = engine.locks
+        if "url" in locks and message.text:
             if message.entities:
                 for ent in message.entities:
                     if ent.type in ["url", "text_link"]:
-                        await message.delete()
-                        return
+                        return "url"
             lower = message.text.lower()
             if "t.me/" in lower or "telegram.me/" in lower:
-                await message.delete()
-                return
+                return "url"
 
-        if locks.get("sticker") and message.sticker:
-            await message.delete()
-            return
+        if "sticker" in locks and message.sticker:
+            return "sticker"
 
-        if locks.get("media") and (message.photo or message.video or message.document or message.animation):
-            await message.delete()
-            return
+        if "media" in locks and (message.photo or message.video or message.document or message.animation):
+            return "media"
 
-        if locks.get("username") and message.text and "@" in message.text:
-            await message.delete()
-            return
+        if "username" in locks and message.text and "@" in message.text:
+            return "username"
 
-        if locks.get("forward") and message.forward_from:
-            await message.delete()
-            return
-        return
+        if "forward" in locks and message.forward_from:
+            return "forward"
+
+        if engine.script_lock and (message.text or message.caption):
+            if engine.script_lock.violates(message.text or message.caption):
+                return "language"
+        return None
 
 # ==========================================================
 # Moderation system
 # ==========================================================
 
-    # ==== extract user from username or user_id
-    async def extract_target_user(client, message):
-        if message.reply_to_message:
-            return message.reply_to_message.from_user
+    async def report_batch(ctx: CommandContext, results: list, icon: str, done: str, verb: str):
+        ok = [item for item, _, error in results if error is None]
+        failed = [(item, error) for item, _, error in results if error is not None]
 
-        parts = message.text.split(maxsplit=1)
-        if len(parts) < 2:
-            return None
+        if len(results) == 1:
+            if ok:
+                return await ctx.reply(f"{icon} {ok[0].mention} has been {done}.")
+            return await ctx.reply(f"❌ Failed to {verb}: {failed[0][1]}")
 
-        arg = parts[1]
-        user = None
-
-        if arg.startswith("@"):
-            try:
-                user = await client.get_users(arg)
-            except Exception:
-                pass
-        elif arg.isdigit():
-            try:
-                user = await client.get_users(int(arg))
-            except Exception:
-                pass
-
-        return user
+        text = ""
+        if ok:
+            text += f"{icon} {done.capitalize()} ({len(ok)}): " + ", ".join(u.mention for u in ok)
+        if failed:
+            text += f"\n❌ Failed ({len(failed)}):\n" + "\n".join(f"• {u.mention}: {e}" for u, e in failed)
+        await ctx.reply(text.strip())
 
 # ==========================================================
 # kick
 # ==========================================================
-    @app.on_message(filters.group & filters.command("kick"))
-    async def kick_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    @router.command("kick", right="can_restrict_members", target=TARGET_MANY,
+                    usage="⚠️ Usage: Reply or use `/kick @user1 @user2 ...`")
+    async def kick_user(ctx: CommandContext):
+        client, chat_id = ctx.client, ctx.chat_id
 
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/kick @username`")
+        async def kick(user):
+            await client.ban_chat_member(chat_id, user.id)
+            await client.unban_chat_member(chat_id, user.id)
+            audit.record(chat_id, "kick", ctx.user_id, user.id)
 
-        try:
-            await client.ban_chat_member(message.chat.id, user.id)
-            await client.unban_chat_member(message.chat.id, user.id)
-            await message.reply_text(f"👢 {user.mention} has been kicked.")
-        except Exception as e:
-            await message.reply_text(f"❌ Failed to kick: {e}")
+        results = await moderation_executor.run(ctx.targets, kick)
+        await report_batch(ctx, results, "👢", "kicked", "kick")
 
 # ==========================================================
 # ban
 # ==========================================================
-    @app.on_message(filters.group & filters.command("ban"))
-    async def ban_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    @router.command("ban", right="can_restrict_members", target=TARGET_MANY,
+                    usage="⚠️ Usage: Reply or use `/ban @user1 @user2 ...`")
+    async def ban_user(ctx: CommandContext):
+        client, chat_id = ctx.client, ctx.chat_id
 
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/ban @username`")
+        async def ban(user):
+            await client.ban_chat_member(chat_id, user.id)
+            await scheduler.cancel(chat_id, user.id, "unban")
+            audit.record(chat_id, "ban", ctx.user_id, user.id)
+            chat_stats.record(chat_id, "bans")
 
-        try:
-            await client.ban_chat_member(message.chat.id, user.id)
-            await message.reply_text(f"🚨 {user.mention} has been banned.")
-        except Exception as e:
-            await message.reply_text(f"❌ Failed to ban: {e}")
+        results = await moderation_executor.run(ctx.targets, ban)
+        await report_batch(ctx, results, "🚨", "banned", "ban")
 
 # ==========================================================
 # unban
 # ==========================================================
-    @app.on_message(filters.group & filters.command("unban"))
-    async def unban_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/unban @username`")
+    @router.command("unban", right="can_restrict_members", target=TARGET_ONE,
+                    usage="⚠️ Usage: Reply or use `/unban @username`")
+    async def unban_user(ctx: CommandContext):
+        user = ctx.target
 
         try:
-            await client.unban_chat_member(message.chat.id, user.id)
-            await message.reply_text(f"✅ {user.mention} has been unbanned.")
+            await ctx.client.unban_chat_member(ctx.chat_id, user.id)
+            await scheduler.cancel(ctx.chat_id, user.id, "unban")
+            audit.record(ctx.chat_id, "unban", ctx.user_id, user.id)
+            await ctx.reply(f"✅ {user.mention} has been unbanned.")
         except Exception as e:
-            await message.reply_text(f"❌ Failed to unban: {e}")
+            await ctx.reply(f"❌ Failed to unban: {e}")
 
 # ==========================================================
 # mute
 # ==========================================================
-    @app.on_message(filters.group & filters.command("mute"))
-    async def mute_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/mute @username`")
+    @router.command("mute", right="can_restrict_members", target=TARGET_MANY,
+                    usage="⚠️ Usage: Reply or use `/mute @user1 @user2 ...`")
+    async def mute_user(ctx: CommandContext):
+        client, chat_id = ctx.client, ctx.chat_id
 
-        try:
+        async def mute(user):
             await client.restrict_chat_member(
-                message.chat.id,
+                chat_id,
                 user.id,
                 permissions=ChatPermissions(can_send_messages=False),
             )
-            await message.reply_text(f"🔇 {user.mention} has been muted.")
-        except Exception as e:
-            await message.reply_text(f"❌ Failed to mute: {e}")
+            await scheduler.cancel(chat_id, user.id, "unmute")
+            audit.record(chat_id, "mute", ctx.user_id, user.id)
+
+        results = await moderation_executor.run(ctx.targets, mute)
+        await report_batch(ctx, results, "🔇", "muted", "mute")
 
 # ==========================================================
 # unmute
 # ==========================================================
-    @app.on_message(filters.group & filters.command("unmute"))
-    async def unmute_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/unmute @username`")
+    @router.command("unmute", right="can_restrict_members", target=TARGET_ONE,
+                    usage="⚠️ Usage: Reply or use `/unmute @username`")
+    async def unmute_user(ctx: CommandContext):
+        user = ctx.target
 
         try:
-            await client.restrict_chat_member(
-                message.chat.id,
+            await ctx.client.restrict_chat_member(
+                ctx.chat_id,
                 user.id,
-                permissions=ChatPermissions(
-                    can_send_messages=True,
-                    can_send_media_messages=True,
-                    can_send_other_messages=True,
-                    can_add_web_page_previews=True,
-                ),
+                permissions=UNMUTE_PERMISSIONS,
             )
-            await message.reply_text(f"🔊 {user.mention} has been unmuted.")
+            await scheduler.cancel(ctx.chat_id, user.id, "unmute")
+            audit.record(ctx.chat_id, "unmute", ctx.user_id, user.id)
+            await ctx.reply(f"🔊 {user.mention} has been unmuted.")
         except Exception as e:
-            await message.reply_text(f"❌ Failed to unmute: {e}")
+            await ctx.reply(f"❌ Failed to unmute: {e}")
 
 # ==========================================================
-# warn
+# purge
 # ==========================================================
-    @app.on_message(filters.group & filters.command("warn"))
-    async def warn_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    @router.command("purge", right="can_delete_messages")
+    async def purge_messages(ctx: CommandContext):
+        client, message, chat_id = ctx.client, ctx.message, ctx.chat_id
+        if not message.reply_to_message:
+            return await ctx.reply("⚠️ Usage: Reply to the first message to delete with /purge")
 
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/warn @username`")
-
-        warns = await db.add_warn(message.chat.id, user.id)
-        if warns >= 3:
-            await client.restrict_chat_member(
-                message.chat.id,
-                user.id,
-                permissions=ChatPermissions(can_send_messages=False),
+        span = message.id - message.reply_to_message.id + 1
+        if span > PURGE_MAX_SPAN:
+            return await ctx.reply(
+                f"⚠️ That is {span} messages; /purge covers at most {PURGE_MAX_SPAN} at once. "
+                "Reply to a more recent message."
             )
-            await message.reply_text(f"🚫 {user.mention} reached 3 warns and was muted.")
-        else:
-            await message.reply_text(f"⚠️ {user.mention} now has {warns}/3 warnings.")
+
+        message_ids = list(range(message.reply_to_message.id, message.id + 1))
+        chunks = [message_ids[i:i + PURGE_CHUNK] for i in range(0, len(message_ids), PURGE_CHUNK)]
+
+        started = time.monotonic()
+        status = None
+        if not ctx.quiet:
+            status = await client.send_message(chat_id, f"🧹 Purging {len(message_ids)} messages...")
+        last_edit = started
+
+        async def delete_chunk(chunk):
+            return await client.delete_messages(chat_id, chunk)
+
+        async def progress(completed, total):
+            nonlocal last_edit
+            now = time.monotonic()
+            if status and completed < total and now - last_edit >= PURGE_PROGRESS_INTERVAL:
+                last_edit = now
+                try:
+                    await status.edit_text(f"🧹 Purging... {completed * 100 // total}%")
+                except Exception:
+                    pass
+
+        results = await purge_executor.run(chunks, delete_chunk, progress)
+        deleted = sum(count or 0 for _, count, error in results if error is None)
+        errors = [error for _, _, error in results if error is not None]
+
+        audit.record(chat_id, "purge", ctx.user_id, count=deleted)
+        text = f"🧹 Purged {deleted} messages in {time.monotonic() - started:.1f}s."
+        if errors:
+            text += f"\n⚠️ {len(errors)} chunks failed: {errors[0]}"
+        if status:
+            await status.edit_text(text)
+
+# ==========================================================
+# timed mute / ban
+# ==========================================================
+    async def timed_sanction(ctx: CommandContext, action: str):
+        client, chat_id = ctx.client, ctx.chat_id
+        user, (seconds,) = ctx.target, ctx.args
+        lift = "unmute" if action == "mute" else "unban"
+
+        # Telegram lifts it by itself when it can; otherwise apply it forever and lift locally
+        native = telegram_can_expire(seconds)
+        until_date = datetime.now(timezone.utc) + timedelta(seconds=seconds) if native else zero_datetime()
+
+        # The lift is stored first, so a failed write never leaves a permanent sanction
+        if not native:
+            try:
+                await scheduler.schedule(chat_id, user.id, lift, datetime.utcnow() + timedelta(seconds=seconds))
+            except Exception as e:
+                return await ctx.reply(f"❌ Failed to {action}: could not schedule the {lift} ({e})")
+
+        try:
+            if action == "mute":
+                await client.restrict_chat_member(
+                    chat_id,
+                    user.id,
+                    permissions=ChatPermissions(can_send_messages=False),
+                    until_date=until_date,
+                )
+            else:
+                await client.ban_chat_member(chat_id, user.id, until_date=until_date)
+                chat_stats.record(chat_id, "bans")
+        except Exception as e:
+            if not native:
+                await scheduler.cancel(chat_id, user.id, lift)
+            return await ctx.reply(f"❌ Failed to {action}: {e}")
+
+        if native:
+            await scheduler.cancel(chat_id, user.id, lift)
+
+        audit.record(chat_id, f"t{action}", ctx.user_id, user.id, duration=seconds)
+        done = "🔇 {} has been muted" if action == "mute" else "🚨 {} has been banned"
+        await ctx.reply(f"{done.format(user.mention)} for {format_duration(seconds)}.")
+
+    @router.command("tmute", right="can_restrict_members", target=TARGET_ONE, args=(duration,),
+                    usage="⚠️ Usage: Reply with `/tmute 2h` or use `/tmute @username 7d`")
+    async def tmute_user(ctx: CommandContext):
+        await timed_sanction(ctx, "mute")
+
+    @router.command("tban", right="can_restrict_members", target=TARGET_ONE, args=(duration,),
+                    usage="⚠️ Usage: Reply with `/tban 2h` or use `/tban @username 7d`")
+    async def tban_user(ctx: CommandContext):
+        await timed_sanction(ctx, "ban")
 
 # ==========================================================
-# warns
+# warn
 # ==========================================================
-    @app.on_message(filters.group & filters.command("warns"))
-    async def warns_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    async def apply_warn_action(client, chat_id: int, user_id: int, action: str):
+        if action == "ban":
+            await client.ban_chat_member(chat_id, user_id)
+        elif action == "kick":
+            await client.ban_chat_member(chat_id, user_id)
+            await client.unban_chat_member(chat_id, user_id)
+        else:
+            await client.restrict_chat_member(
+                chat_id,
+                user_id,
+                permissions=ChatPermissions(can_send_messages=False),
+            )
 
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/warns @username`")
+    # The right is checked up front so a warning is never stored without its sanction
+    @router.command("warn", right="can_restrict_members", target=TARGET_ONE, args=(optional(free_text),),
+                    usage="⚠️ Usage: Reply or use `/warn @username [reason]`")
+    async def warn_user(ctx: CommandContext):
+        user, (reason,) = ctx.target, ctx.args
+        chat_id = ctx.chat_id
+        settings = await db.get_warn_settings(chat_id)
+        limit = settings["limit"]
+
+        warns = await db.add_warn(chat_id, user.id, ctx.user_id, reason, settings["expiry"])
+        audit.record(chat_id, "warn", ctx.user_id, user.id, reason, count=warns)
+        chat_stats.record(chat_id, "warns")
+        if warns < limit:
+            return await ctx.reply(f"⚠️ {user.mention} now has {warns}/{limit} warnings.")
+
+        action = settings["action"]
+        try:
+            await apply_warn_action(ctx.client, chat_id, user.id, action)
+        except Exception as e:
+            return await ctx.reply(f"❌ Failed to {action}: {e}")
+
+        await db.reset_warns(chat_id, user.id)
+        audit.record(chat_id, f"warn_{action}", None, user.id, f"reached {limit} warns")
+        if action == "ban":
+            chat_stats.record(chat_id, "bans")
+        done = {"mute": "muted", "kick": "kicked", "ban": "banned"}[action]
+        await ctx.reply(f"🚫 {user.mention} reached {limit} warns and was {done}.")
+
+# ==========================================================
+# warns (paged history)
+# ==========================================================
+    WARNS_PAGE_SIZE = 10
+
+    async def render_warns(chat_id: int, user_id: int, before_id=None):
+        history = await db.get_warn_history(chat_id, user_id, before_id, WARNS_PAGE_SIZE + 1)
+        has_more = len(history) > WARNS_PAGE_SIZE
+        history = history[:WARNS_PAGE_SIZE]
+
+        lines = []
+        for warn in history:
+            when = warn["created_at"].strftime("%Y-%m-%d %H:%M")
+            reason = warn.get("reason") or "no reason"
+            issuer = warn.get("issuer_id")
+            lines.append(f"• {when} — {reason}" + (f" (by `{issuer}`)" if issuer else ""))
+
+        markup = None
+        if has_more:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton(
+                "Older ▶", callback_data=f"warns:{user_id}:{history[-1]['_id']}"
+            )]])
+        return "\n".join(lines), markup
+
+    @router.command("warns", target=TARGET_ONE, skip_stale=True, usage="⚠️ Usage: Reply or use `/warns @username`")
+    async def warns_user(ctx: CommandContext):
+        user, chat_id = ctx.target, ctx.chat_id
+        warns = await db.get_warns(chat_id, user.id)
+        limit = (await db.get_warn_settings(chat_id))["limit"]
+        if not warns:
+            return await ctx.reply(f"⚠️ {user.mention} has 0/{limit} warnings.")
+
+        history, markup = await render_warns(chat_id, user.id)
+        await ctx.reply(
+            f"⚠️ {user.mention} has {warns}/{limit} warnings.\n\n{history}",
+            reply_markup=markup
+        )
 
-        warns = await db.get_warns(message.chat.id, user.id)
-        await message.reply_text(f"⚠️ {user.mention} has {warns}/3 warnings.")
+    @app.on_callback_query(filters.regex(r"^warns:"))
+    async def warns_page(client, callback_query: CallbackQuery):
+        chat_id = callback_query.message.chat.id
+        if not await is_power(client, chat_id, callback_query.from_user.id):
+            return await callback_query.answer("❌ Only admin can do this.", show_alert=True)
+
+        _, user_id, before = callback_query.data.split(":")
+        history, markup = await render_warns(chat_id, int(user_id), ObjectId(before))
+        await callback_query.message.edit_text(
+            f"⚠️ Older warnings of `{user_id}`:\n\n{history or 'No more warnings.'}",
+            reply_markup=markup
+        )
+        await callback_query.answer()
 
 # ==========================================================
-# resetwarns
+# warn settings
 # ==========================================================
-    @app.on_message(filters.group & filters.command("resetwarns"))
-    async def resetwarns_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    @router.command("warnset")
+    async def warn_settings(ctx: CommandContext):
+        chat_id = ctx.chat_id
+        parts = [ctx.command] + ctx.words
+        usage = "⚙️ Usage: /warnset limit <n> | action <mute|kick|ban> | expiry <7d|off>"
 
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/resetwarns @username`")
+        if len(parts) == 1:
+            settings = await db.get_warn_settings(chat_id)
+            expiry = format_duration(settings["expiry"]) if settings["expiry"] else "never"
+            return await ctx.reply(
+                f"⚙️ **Warn settings**\n\n"
+                f"• Limit: {settings['limit']}\n"
+                f"• Action: {settings['action']}\n"
+                f"• Expiry: {expiry}\n\n{usage}"
+            )
+        if len(parts) != 3:
+            return await ctx.reply(usage)
+
+        key, value = parts[1].lower(), parts[2].lower()
+        if key == "limit" and value.isdigit() and 1 <= int(value) <= 20:
+            await db.set_warn_setting(chat_id, "limit", int(value))
+        elif key == "action" and value in db.WARN_ACTIONS:
+            await db.set_warn_setting(chat_id, "action", value)
+        elif key == "expiry" and (value == "off" or parse_duration(value)):
+            await db.set_warn_setting(chat_id, "expiry", 0 if value == "off" else parse_duration(value))
+        else:
+            return await ctx.reply(usage)
 
-        await db.reset_warns(message.chat.id, user.id)
-        await message.reply_text(f"✅ {user.mention}'s warns have been reset.")
+        await ctx.reply(f"✅ Warn {key} set to {value}.")
 
 # ==========================================================
 # resetwarns
 # ==========================================================
-    @app.on_message(filters.group & filters.command("resetwarns"))
-    async def resetwarns_user(client, message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
-
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply or use `/resetwarns @username`")
-
-        await db.reset_warns(message.chat.id, user.id)
-        await message.reply_text(f"✅ {user.mention}'s warns have been reset.")
+    @router.command("resetwarns", target=TARGET_ONE, usage="⚠️ Usage: Reply or use `/resetwarns @username`")
+    async def resetwarns_user(ctx: CommandContext):
+        user = ctx.target
+        await db.reset_warns(ctx.chat_id, user.id)
+        audit.record(ctx.chat_id, "resetwarns", ctx.user_id, user.id)
+        await ctx.reply(f"✅ {user.mention}'s warns have been reset.")
 
-            
 # ==========================================================
 # Promote Command
 # ==========================================================
-    @app.on_message(filters.group & filters.command("promote"))
-    async def promote_user(client: Client, message: Message):
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin or owner can use this command.")
-    
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply to a user or use '/promote @username'")
+    @router.command("promote", right="can_promote_members", target=TARGET_ONE,
+                    usage="⚠️ Usage: Reply to a user or use '/promote @username'")
+    async def promote_user(ctx: CommandContext):
+        user = ctx.target
     
         try:
             privileges = ChatPrivileges(
@@ -553,46 +761,33 @@ def register_group_commands(app: Client):
                 is_anonymous=False
             )
     
-            await client.promote_chat_member(
-                chat_id=message.chat.id,
+            await ctx.client.promote_chat_member(
+                chat_id=ctx.chat_id,
                 user_id=user.id,
                 privileges=privileges
             )
-            await message.reply_text(f"✅ {user.mention} has been promoted to admin.")
+            audit.record(ctx.chat_id, "promote", ctx.user_id, user.id)
+            await ctx.reply(f"✅ {user.mention} has been promoted to admin.")
     
+        except UserNotParticipant:
+            await ctx.reply("⚠️ Cannot promote: user is not a member of this chat.")
         except Exception as e:
-            if "USER_NOT_PARTICIPANT" in str(e):
-                await message.reply_text("⚠️ Cannot promote: user is not a member of this chat.")
-            elif "CHAT_ADMIN_REQUIRED" in str(e):
-                await message.reply_text("⚠️ Bot must be admin with 'Add Admins' permission to promote.")
-            else:
-                await message.reply_text(f"❌ Failed to promote: {e}")
+            await ctx.reply(f"❌ Failed to promote: {e}")
     
     
 # ==========================================================
 # Demote Command
 # ==========================================================
-    @app.on_message(filters.group & filters.command("demote"))
-    async def demote_user(client: Client, message: Message):
-        # Check if executor is admin
-        if not await is_power(client, message.chat.id, message.from_user.id):
-            return await message.reply_text("❌ Only admin can use this command.")
+    @router.command("demote", right="can_promote_members", target=TARGET_ONE,
+                    usage="⚠️ Usage: Reply to a user or use '/demote @username'")
+    async def demote_user(ctx: CommandContext):
+        user = ctx.target
     
-        user = await extract_target_user(client, message)
-        if not user:
-            return await message.reply_text("⚠️ Usage: Reply to a user or use '/demote @username'")
-    
-        try:
-            target_member = await client.get_chat_member(message.chat.id, user.id)
-        except Exception as e:
-            if "USER_NOT_PARTICIPANT" in str(e):
-                return await message.reply_text("❌ Cannot demote: user is not a member of this chat.")
-            return await message.reply_text(f"⚠️ Failed to demote: {e}")
-    
-        if target_member.status == ChatMemberStatus.OWNER:
-            return await message.reply_text("⚠️ You cannot demote the group owner.")
-        if user.id == message.from_user.id:
-            return await message.reply_text("❌ You cannot demote yourself.")
+        # The cached admin list includes the owner: no get_chat_member for the target
+        if await admin_cache.is_owner(ctx.client, ctx.chat_id, user.id):
+            return await ctx.reply("⚠️ You cannot demote the group owner.")
+        if user.id == ctx.user_id:
+            return await ctx.reply("❌ You cannot demote yourself.")
     
         try:
             no_privileges = ChatPrivileges(
@@ -609,15 +804,15 @@ def register_group_commands(app: Client):
                 is_anonymous=False
             )
     
-            await client.promote_chat_member(
-                chat_id=message.chat.id,
+            await ctx.client.promote_chat_member(
+                chat_id=ctx.chat_id,
                 user_id=user.id,
                 privileges=no_privileges
             )
-            await message.reply_text(f"✅ {user.mention} has been demoted from admin.")
+            audit.record(ctx.chat_id, "demote", ctx.user_id, user.id)
+            await ctx.reply(f"✅ {user.mention} has been demoted from admin.")
     
+        except UserNotParticipant:
+            await ctx.reply("❌ Cannot demote: user is not a member of this chat.")
         except Exception as e:
-            if "CHAT_ADMIN_REQUIRED" in str(e):
-                await message.reply_text("❌ Bot must be admin with 'Add Admins' permission to demote.")
-            else:
-                await message.reply_text(f"⚠️ Failed to demote: {e}")
+            await ctx.reply(f"⚠️ Failed to demote: {e}")
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+from pyrogram import Client, filters
+from pyrogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from bson import ObjectId
+import db
+from utils.admin_cache import admin_cache
+from utils.audit import audit
+from utils.commands import router, CommandContext
+from utils.user_cache import user_cache
+
+MODLOG_PAGE_SIZE = 25
+MODLOG_MAX_LAST = 100
+
+
+def register_modlog(app: Client):
+
+    def format_event(event: dict) -> str:
+        when = event["at"].strftime("%m-%d %H:%M")
+        admin = f"`{event['admin_id']}`" if event.get("admin_id") else "bot"
+        line = f"• {when} {event['action']} by {admin}"
+        if event.get("target_id"):
+            line += f" → `{event['target_id']}`"
+        if event.get("reason"):
+            line += f" ({event['reason']})"
+        return line
+
+    async def render_page(chat_id: int, admin_id: int, before_id, limit: int):
+        events = await db.get_modlog(chat_id, admin_id, before_id, limit + 1)
+        has_more = len(events) > limit
+        events = events[:limit]
+
+        markup = None
+        if has_more:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton(
+                "Older ▶", callback_data=f"modlog:{admin_id or 0}:{events[-1]['_id']}:{limit}"
+            )]])
+        return "\n".join(format_event(e) for e in events), markup
+
+    async def export_modlog(ctx: CommandContext):
+        chat_id = ctx.chat_id
+        status = await ctx.reply("📦 Exporting moderation log...")
+
+        # Pending events first, so the export is complete up to now
+        await audit.flush()
+
+        fd, path = tempfile.mkstemp(prefix=f"modlog_{chat_id}_", suffix=".jsonl")
+        count = 0
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                async for event in db.iter_modlog(chat_id):
+                    out.write(json.dumps(event, default=str, ensure_ascii=False) + "\n")
+                    count += 1
+
+            if not count:
+                return await status.edit_text("🤖 No moderation events recorded in this chat.")
+
+            await ctx.client.send_document(
+                chat_id,
+                path,
+                file_name=f"modlog_{chat_id}.jsonl",
+                caption=f"📜 {count} moderation events",
+            )
+            await status.delete()
+        finally:
+            os.remove(path)
+
+# ==========================================================
+# /modlog, /modlog @admin, /modlog last 50, /modlog export
+# ==========================================================
+    @router.command("modlog", skip_stale=True)
+    async def modlog_command(ctx: CommandContext):
+        chat_id = ctx.chat_id
+        parts = [ctx.command] + ctx.words
+        admin_id = None
+        limit = MODLOG_PAGE_SIZE
+
+        if len(parts) > 1 and parts[1].lower() == "export":
+            return await export_modlog(ctx)
+
+        if len(parts) > 2 and parts[1].lower() == "last" and parts[2].isdigit():
+            limit = max(1, min(int(parts[2]), MODLOG_MAX_LAST))
+        elif len(parts) > 1:
+            admin = await user_cache.resolve(ctx.client, parts[1])
+            if not admin:
+                return await ctx.reply(
+                    "⚠️ Usage: /modlog | /modlog @admin | /modlog last 50 | /modlog export"
+                )
+            admin_id = admin.id
+
+        # Show what is still buffered too
+        await audit.flush()
+        text, markup = await render_page(chat_id, admin_id, None, limit)
+        if not text:
+            return await ctx.reply("🤖 No moderation events found.")
+        await ctx.reply(f"📜 **Moderation log**\n\n{text}", reply_markup=markup)
+
+    @app.on_callback_query(filters.regex(r"^modlog:"))
+    async def modlog_page(client, callback_query: CallbackQuery):
+        chat_id = callback_query.message.chat.id
+        if not await admin_cache.is_admin(client, chat_id, callback_query.from_user.id):
+            return await callback_query.answer("❌ Only admin can do this.", show_alert=True)
+
+        _, admin_id, before, limit = callback_query.data.split(":")
+        text, markup = await render_page(chat_id, int(admin_id) or None, ObjectId(before), int(limit))
+        await callback_query.message.edit_text(
+            f"📜 **Moderation log**\n\n{text or 'No older events.'}",
+            reply_markup=markup
+        )
+        await callback_query.answer()
@@ -0,0 +1,98 @@
+import re
+from pyrogram import Client
+from config import OWNER_ID
+import db
+from utils.commands import router, CommandContext, ROLE_MEMBER
+
+PRESET_NAME = re.compile(r"^[a-z0-9_-]{1,32}$")
+PRESET_DETACH = "none"
+
+
+def can_use(preset: dict, chat_id: int) -> bool:
+    # Presets are private to the chat that made them, unless the bot owner made them
+    return preset["owner_chat"] == chat_id or preset.get("created_by") == OWNER_ID
+
+
+def can_edit(preset: dict, chat_id: int, user_id: int) -> bool:
+    if user_id == OWNER_ID:
+        return True
+    return preset["owner_chat"] == chat_id and preset.get("created_by") != OWNER_ID
+
+
+def register_presets(app: Client):
+
+    def preset_name(ctx: CommandContext):
+        words = ctx.words
+        if len(words) != 1:
+            return None
+        name = words[0].lower()
+        return name if PRESET_NAME.match(name) else None
+
+# ==========================================================
+# /presets
+# ==========================================================
+    @router.command("presets", role=ROLE_MEMBER, skip_stale=True)
+    async def presets_list(ctx: CommandContext):
+        presets = await db.list_presets(ctx.chat_id, OWNER_ID)
+        if not presets:
+            return await ctx.reply("🤖 No presets yet. Save this chat's settings with /savepreset <name>.")
+
+        current = await db.get_chat_preset(ctx.chat_id)
+        lines = ["🧬 **Settings presets**\n"]
+        for preset in presets:
+            line = f"• `{preset['name']}` — {preset['chats']} chats"
+            if preset["owner_chat"] != ctx.chat_id:
+                line += " (shared)"
+            if preset["name"] == current:
+                line += " ✅ in use here"
+            lines.append(line)
+        lines.append("\n⚙️ /usepreset <name|none> • /savepreset <name>")
+        await ctx.reply("\n".join(lines))
+
+# ==========================================================
+# /usepreset <name|none>
+# ==========================================================
+    @router.command("usepreset")
+    async def use_preset_command(ctx: CommandContext):
+        name = preset_name(ctx)
+        if name is None:
+            return await ctx.reply("⚙️ Usage: /usepreset <name|none>")
+
+        if name == PRESET_DETACH:
+            if not await db.get_chat_preset(ctx.chat_id):
+                return await ctx.reply("🤖 This chat does not use a preset.")
+            # Snapshot taken before detaching, so the chat keeps the settings it has now
+            await db.detach_preset(ctx.chat_id, await db.export_chat_settings(ctx.chat_id))
+            return await ctx.reply("🧬 Preset detached. This chat keeps its current settings as its own.")
+
+        preset = await db.get_preset(name)
+        if not preset or not can_use(preset, ctx.chat_id):
+            return await ctx.reply(f"⚠️ No preset named `{name}`. See /presets.")
+
+        await db.use_preset(ctx.chat_id, name)
+        await ctx.reply(
+            f"🧬 This chat now uses the `{name}` preset for locks, welcome and anti-cheater.\n"
+            "Changes made here with /lock, /welcome and the like override it for this chat only."
+        )
+
+# ==========================================================
+# /savepreset <name>
+# ==========================================================
+    @router.command("savepreset")
+    async def save_preset_command(ctx: CommandContext):
+        name = preset_name(ctx)
+        if name is None or name == PRESET_DETACH:
+            return await ctx.reply("⚙️ Usage: /savepreset <name> (a-z, 0-9, _ and -, up to 32)")
+
+        # Other chats may follow this preset: only its owner can change it
+        existing = await db.get_preset(name)
+        if existing and not can_edit(existing, ctx.chat_id, ctx.user_id):
+            return await ctx.reply(f"❌ The name `{name}` is taken. Pick another one.")
+
+        settings = await db.export_chat_settings(ctx.chat_id)
+        await db.save_preset(name, ctx.chat_id, ctx.user_id, settings)
+        # Its settings now live in the preset, so the chat follows it with no overrides
+        await db.use_preset(ctx.chat_id, name)
+
+        verb = "updated for every chat using it" if existing else "saved"
+        await ctx.reply(f"🧬 Preset `{name}` {verb}.")
@@ -1,4 +1,6 @@
+import logging
 from pyrogram import Client, filters
+from pyrogram.errors import InputUserDeactivated, UserIsBlocked
 from pyrogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -7,6 +9,8 @@ from pyrogram.types import (
 from config import BOT_USERNAME, SUPPORT_GROUP, UPDATE_CHANNEL, START_IMAGE, OWNER_ID
 import db
 
+logger = logging.getLogger(__name__)
+
 def register_handlers(app: Client):
 
 # ==========================================================
@@ -119,6 +123,9 @@ Commands to Manage Welcome Messages:
 - /setwelcome <text> : Set a custom welcome message for your group
 - /welcome on        : Enable the welcome messages
 - /welcome off       : Disable the welcome messages
+- /captcha button|math : New members must pass a check before chatting
+- /captcha timeout 5m : Kick members who do not pass in time
+- /captcha off       : Welcome new members right away
 
 Supported Placeholders:
 - {username} : Telegram username
@@ -158,6 +165,12 @@ Available Lock Types:
 - media     : Block photos/videos/gifs
 - username  : Block messages with @username mentions
 - language  : Block non-English messages
+- forward   : Block forwarded messages
+
+Language Lock Options:
+- /langlock allow <scripts> : e.g. /langlock allow latin cyrillic
+- /langlock deny <scripts>  : e.g. /langlock deny arabic cjk
+- /langlock threshold <0.3> : Share of blocked letters needed to delete
 
 Example:
  /lock url       : Blocks any messages containing links
@@ -183,15 +196,24 @@ Example:
 
 Manage your group easily with these tools:
 
-¤ /kick <user> — Remove a user  
-¤ /ban <user> — Ban permanently  
+¤ /kick <users> — Remove one or more users  
+¤ /ban <users> — Ban permanently  
 ¤ /unban <user> — Lift ban  
-¤ /mute <user> — Disable messages  
+¤ /mute <users> — Disable messages  
+¤ /tmute <user> <time> — Mute for a while (e.g. 2h)  
+¤ /tban <user> <time> — Ban for a while (e.g. 7d)  
 ¤ /unmute <user> — Allow messages again  
-¤ /warn <user> — Add warning (3 = mute)  
-¤ /warns <user> — View warnings  
+¤ /warn <user> [reason] — Add warning (3 = mute by default)  
+¤ /warns <user> — View warnings with history  
+¤ /warnset — Set warn limit, action and expiry  
 ¤ /resetwarns <user> — Clear all warnings  
 ¤ /anticheater on/off — Enable or disable ban all protection  
+¤ /purge — Reply to a message to delete everything from it up to now  
+¤ /modlog [@admin | last 50 | export] — Moderation history  
+¤ /chatstats [24h | 7d | 30d] — Messages, joins, warns, bans, deletions and most active members
+¤ /savepreset <name> — Share this chat's locks, welcome and anti-cheater settings
+¤ /usepreset <name|none> — Follow a shared preset, overriding it locally as needed
+¤ /presets — List presets and how many chats use them
 ¤ /promote <user> — make admin
 ¤ /demote <user> — remove from admin  
 
@@ -209,7 +231,7 @@ Reply to a user or type
             await callback_query.answer()
     
         except Exception as e:
-            print(f"Error in info_callback: {e}")
+            logger.error(f"Error in info_callback: {e}")
             await callback_query.answer("❌ Something went wrong.", show_alert=True)
     
 
@@ -233,6 +255,7 @@ Reply to a user or type
 
         users = await db.get_all_users()
         sent, failed = 0, 0
+        blocked = []
 
         await message.reply_text(f"Broadcasting to {len(users)} users..")
 
@@ -240,9 +263,15 @@ Reply to a user or type
             try:
                 await client.send_message(user_id, text_to_send)
                 sent += 1
+            except (UserIsBlocked, InputUserDeactivated):
+                blocked.append(user_id)
+                failed += 1
             except Exception:
                 failed += 1
 
+        # Picked up by the compactor once they stay blocked long enough
+        if blocked:
+            await db.mark_users_blocked(blocked)
         await message.reply_text(f"✅ Broadcast finished!\n\n Sent: {sent}\nFailed: {failed}")
 
 # ==========================================================
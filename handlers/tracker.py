@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+from pyrogram import Client
+from pyrogram.types import Message, ChatMemberUpdated
+from pyrogram.enums import ChatType, ChatMemberStatus, MessageEntityType
+import db
+from config import CHAT_CLEANUP_DELAY
+from utils.admin_cache import admin_cache
+from utils.bot_perms import bot_perms
+from utils.chat_stats import chat_stats
+from utils.scheduler import scheduler
+from utils.user_cache import user_cache
+
+# Runs before every other handler group and never stops propagation
+TRACKER_GROUP = -50
+
+# Refresh a chat's registry entry at most this often
+CHAT_TOUCH_INTERVAL = 3600
+
+REMOVED = (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED)
+
+
+def register_tracker(app: Client):
+
+    chat_touched = {}
+
+    async def touch_chat(chat):
+        if chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return
+        now = time.monotonic()
+        if now - chat_touched.get(chat.id, -CHAT_TOUCH_INTERVAL) < CHAT_TOUCH_INTERVAL:
+            return
+        chat_touched[chat.id] = now
+        await db.touch_chat(chat.id, chat.title)
+
+    def count_activity(message: Message):
+        if message.chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return
+        if message.new_chat_members:
+            chat_stats.record(message.chat.id, "joins", len(message.new_chat_members))
+        elif not message.service:
+            chat_stats.message(message.chat.id, message.from_user.id if message.from_user else None)
+
+# ==========================================================
+# learn identities from every message
+# ==========================================================
+    @app.on_message(group=TRACKER_GROUP)
+    async def track_message(client, message: Message):
+        await touch_chat(message.chat)
+        user_cache.learn(message.from_user)
+        count_activity(message)
+
+        if message.reply_to_message:
+            user_cache.learn(message.reply_to_message.from_user)
+        if message.forward_from:
+            user_cache.learn(message.forward_from)
+        if message.new_chat_members:
+            for user in message.new_chat_members:
+                user_cache.learn(user)
+        if message.left_chat_member:
+            user_cache.learn(message.left_chat_member)
+
+        for ent in message.entities or ():
+            if ent.type == MessageEntityType.TEXT_MENTION:
+                user_cache.learn(ent.user)
+
+# ==========================================================
+# learn identities and admin changes from member updates
+# ==========================================================
+    @app.on_chat_member_updated(group=TRACKER_GROUP)
+    async def track_member_update(client, cmu: ChatMemberUpdated):
+        user_cache.learn(cmu.from_user)
+        member = cmu.new_chat_member or cmu.old_chat_member
+        if member:
+            user_cache.learn(member.user)
+            new_status = cmu.new_chat_member.status if cmu.new_chat_member else None
+            admin_cache.update(cmu.chat.id, member.user.id, new_status)
+            if member.user.is_self:
+                bot_perms.update(cmu.chat.id, cmu.new_chat_member)
+                await schedule_cleanup(cmu.chat.id, new_status)
+
+    async def schedule_cleanup(chat_id: int, status):
+        # A grace period so a quick re-add keeps the chat's settings
+        if status in REMOVED:
+            due = datetime.utcnow() + timedelta(seconds=CHAT_CLEANUP_DELAY)
+            await scheduler.schedule(chat_id, 0, "cleanup", due)
+        elif status is not None:
+            await scheduler.cancel(chat_id, 0, "cleanup")
@@ -1,28 +1,54 @@
+import time
+STARTED_AT = time.perf_counter()
+
+# Before anything else logs
+from utils.logs import setup_logging
+setup_logging()
+
 import os
 import logging
 import threading
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
-from pyrogram import Client
-from config import API_ID, API_HASH, BOT_TOKEN
+from pyrogram import Client, idle
+from config import API_ID, API_HASH, BOT_TOKEN, SESSION_STORAGE, SESSION_SNAPSHOT_INTERVAL, SESSION_FILE
 from handlers import register_all_handlers
-from db import db
+import db
+from utils.admin_cache import admin_cache
+from utils.audit import audit
+from utils.captcha import captcha
+from utils.chat_stats import chat_stats
+from utils.compactor import compactor
+from utils.gban import gban_index
+from utils.lifecycle import lifecycle
+from utils.metrics import metrics
+from utils.scheduler import scheduler
+from utils.session_storage import SnapshotStorage
+from utils.spam_sketch import spam_detector
+from utils.user_cache import user_cache
 
-#  LOGGING 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 #  WEB SERVER (RENDER FIX) 
 PORT = int(os.environ.get("PORT", 10000))
 
 class HealthHandler(BaseHTTPRequestHandler):
     def do_GET(self):
+        if self.path == "/metrics":
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
         self.send_response(200)
         self.end_headers()
         self.wfile.write(b"Nomade Help Bot is running")
 
 def start_web_server():
     server = HTTPServer(("0.0.0.0", PORT), HealthHandler)
-    logging.info(f"Web server running on port {PORT}")
+    logger.info(f"Web server running on port {PORT}")
     server.serve_forever()
 
 threading.Thread(target=start_web_server, daemon=True).start()
@@ -35,8 +61,40 @@ app = Client(
     bot_token=BOT_TOKEN
 )
 
+# Peers in memory, snapshotted to MongoDB or a file instead of SQLite
+if SESSION_STORAGE != "sqlite":
+    app.storage = SnapshotStorage(app.name, SESSION_STORAGE, SESSION_SNAPSHOT_INTERVAL, SESSION_FILE)
+
 register_all_handlers(app)
 
-print("Bot is starting...")
+#  LIFECYCLE 
+# Warm-up runs in the background once updates are already being accepted
+lifecycle.on_warmup("indexes", db.ensure_indexes)
+lifecycle.on_warmup("settings", db.warm_settings_cache)
+lifecycle.on_warmup("legacy warns", db.migrate_legacy_warns)
+lifecycle.on_warmup("admins", lambda: admin_cache.warm(app))
+lifecycle.on_warmup("gbans", gban_index.start)
+lifecycle.on_warmup("spam sketch", spam_detector.start)
+lifecycle.on_warmup("scheduler", lambda: scheduler.start(app))
+lifecycle.on_warmup("captcha", lambda: captcha.start(app))
+lifecycle.on_warmup("compactor", lambda: compactor.start(app))
+
+# Drained in order after intake stops, before the client disconnects
+lifecycle.on_shutdown("scheduler", scheduler.stop)
+lifecycle.on_shutdown("compactor", compactor.stop)
+lifecycle.on_shutdown("captcha", captcha.stop)
+lifecycle.on_shutdown("gbans", gban_index.stop)
+lifecycle.on_shutdown("spam sketch", spam_detector.stop)
+lifecycle.on_shutdown("user cache", user_cache.flush)
+lifecycle.on_shutdown("audit log", audit.flush)
+lifecycle.on_shutdown("chat stats", chat_stats.flush)
+lifecycle.on_shutdown("db replay", db.replay_writes)
+
+async def main():
+    await lifecycle.start(app, STARTED_AT)
+    await idle()
+    await lifecycle.shutdown(app)
+
+logger.info("Bot is starting...")
 
-app.run()
+app.run(main())
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from pyrogram.enums import ChatMemberStatus, ChatMembersFilter
+
+import db
+from config import ADMIN_CACHE_TTL, ADMIN_WARMUP_DAYS
+from utils.ratelimit import RateLimiter, call_with_floodwait
+
+logger = logging.getLogger(__name__)
+
+ADMIN_STATUSES = (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER)
+
+
+class AdminCache:
+    """
+    Per-chat admin lists with a TTL, loaded with one `get_chat_members`
+    call instead of a `get_chat_member` per check. Kept fresh from
+    chat member updates.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._chats = {}      # chat_id -> (expires_at, {user_id: status})
+        self._loading = {}    # chat_id -> Task
+
+    async def _load(self, client, chat_id: int) -> dict:
+        admins = {}
+        async for member in client.get_chat_members(chat_id, filter=ChatMembersFilter.ADMINISTRATORS):
+            admins[member.user.id] = member.status
+        self._chats[chat_id] = (time.monotonic() + self.ttl, admins)
+        return admins
+
+    async def get_admins(self, client, chat_id: int) -> dict:
+        cached = self._chats.get(chat_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        # One load per chat, however many handlers ask at once
+        task = self._loading.get(chat_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(client, chat_id))
+            self._loading[chat_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(chat_id, None))
+        return await asyncio.shield(task)
+
+    async def status(self, client, chat_id: int, user_id: int):
+        return (await self.get_admins(client, chat_id)).get(user_id)
+
+    async def is_admin(self, client, chat_id: int, user_id: int) -> bool:
+        return await self.status(client, chat_id, user_id) in ADMIN_STATUSES
+
+    async def is_owner(self, client, chat_id: int, user_id: int) -> bool:
+        return await self.status(client, chat_id, user_id) == ChatMemberStatus.OWNER
+
+    def update(self, chat_id: int, user_id: int, status):
+        cached = self._chats.get(chat_id)
+        if not cached:
+            return
+        if status in ADMIN_STATUSES:
+            cached[1][user_id] = status
+        else:
+            cached[1].pop(user_id, None)
+
+    def invalidate(self, chat_id: int):
+        self._chats.pop(chat_id, None)
+
+    async def warm(self, client, rate: float = 5):
+        """Preload admins of recently active chats."""
+        limiter = RateLimiter(rate)
+        since = datetime.utcnow() - timedelta(days=ADMIN_WARMUP_DAYS)
+        loaded = 0
+        async for chat_id in db.iter_chat_ids(since):
+            if chat_id in self._chats:
+                continue
+            await limiter.acquire()
+            try:
+                await call_with_floodwait(self._load, client, chat_id)
+                loaded += 1
+            except Exception as e:
+                logger.debug(f"Admin warm-up skipped {chat_id}: {e}")
+        return loaded
+
+
+admin_cache = AdminCache(ADMIN_CACHE_TTL)
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from datetime import datetime
+
+import db
+from config import MODLOG_FLUSH_INTERVAL, MODLOG_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """
+    Append-only moderation log. `record` only appends to a buffer; events
+    reach MongoDB in `insert_many` batches, so logging never adds a round
+    trip to the handler.
+    """
+
+    def __init__(self, flush_interval: int, batch_size: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = batch_size * 20
+        self._buffer = []
+        self._flusher = None
+
+    def record(self, chat_id: int, action: str, admin_id: int = None, target_id: int = None,
+               reason: str = None, **extra):
+        event = {
+            "chat_id": chat_id,
+            "action": action,
+            "admin_id": admin_id,
+            "target_id": target_id,
+            "at": datetime.utcnow(),
+        }
+        if reason:
+            event["reason"] = reason
+        if extra:
+            event["extra"] = extra
+
+        self._buffer.append(event)
+        if len(self._buffer) > self.max_buffer:
+            # MongoDB has been unreachable for a while: keep the newest events
+            del self._buffer[:len(self._buffer) - self.max_buffer]
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._buffer:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:len(batch)]
+            try:
+                await db.insert_modlog(batch)
+            except Exception as e:
+                logger.error(f"Audit log flush failed ({len(batch)} events): {e}")
+                self._buffer[:0] = batch
+                return
+
+
+audit = AuditLog(MODLOG_FLUSH_INTERVAL, MODLOG_BATCH_SIZE)
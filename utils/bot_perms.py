@@ -0,0 +1,79 @@
+import asyncio
+import logging
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.utils import get_peer_type
+
+logger = logging.getLogger(__name__)
+
+RIGHT_LABELS = {
+    "can_delete_messages": "Delete Messages",
+    "can_restrict_members": "Ban Users",
+    "can_promote_members": "Add New Admins",
+    "can_pin_messages": "Pin Messages",
+    "can_invite_users": "Invite Users",
+}
+
+
+class BotPermissions:
+    """
+    The bot's own status and admin rights per chat. Filled on first contact
+    with one `get_chat_member(chat, "me")` and then kept current from
+    `my_chat_member` updates, so handlers can skip calls that would fail.
+    """
+
+    def __init__(self):
+        self._chats = {}      # chat_id -> (status, privileges)
+        self._loading = {}    # chat_id -> Task
+        self._noticed = set() # (chat_id, right) already announced to admins
+
+    async def _load(self, client, chat_id: int):
+        member = await client.get_chat_member(chat_id, "me")
+        self._chats[chat_id] = (member.status, member.privileges)
+        return self._chats[chat_id]
+
+    async def get(self, client, chat_id: int) -> tuple:
+        cached = self._chats.get(chat_id)
+        if cached:
+            return cached
+
+        task = self._loading.get(chat_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(client, chat_id))
+            self._loading[chat_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(chat_id, None))
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            logger.debug(f"Could not read own rights in {chat_id}: {e}")
+            return (None, None)
+
+    def update(self, chat_id: int, member):
+        """Called with the bot's new ChatMember from a my_chat_member update."""
+        if member is None:
+            self._chats.pop(chat_id, None)
+            return
+        self._chats[chat_id] = (member.status, member.privileges)
+        # Rights changed: allow a fresh notice if something is still missing
+        self._noticed = {key for key in self._noticed if key[0] != chat_id}
+
+    async def can(self, client, chat_id: int, right: str) -> bool:
+        status, privileges = await self.get(client, chat_id)
+        if status == ChatMemberStatus.OWNER:
+            return True
+        if status != ChatMemberStatus.ADMINISTRATOR:
+            return False
+        if privileges is None:
+            # Basic group admins (ChatParticipantAdmin) carry no rights list: they have them all
+            return get_peer_type(chat_id) == "chat"
+        return bool(getattr(privileges, right, False))
+
+    def first_notice(self, chat_id: int, right: str) -> bool:
+        key = (chat_id, right)
+        if key in self._noticed:
+            return False
+        self._noticed.add(key)
+        return True
+
+
+bot_perms = BotPermissions()
@@ -0,0 +1,55 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. While open, calls are
+    refused without touching the backend; after `reset_timeout` seconds
+    it lets a single trial call through (half-open) and closes on its success.
+    A trial that never reports back is replaced after another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, threshold: int, reset_timeout: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        now = time.monotonic()
+        if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+            return False
+        self._trial_at = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_at = None
+        if self.opened_at is not None:
+            self.opened_at = None
+            logger.info(f"✅ {self.name} circuit closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_at = None
+        if self.state == "half_open" or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            logger.warning(f"⚡ {self.name} circuit open after {self.failures} failures")
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+
+import db
+from config import CAPTCHA_MAX_TIMEOUT, CAPTCHA_FLUSH_INTERVAL, CAPTCHA_KICK_RATE
+from utils.chat_stats import chat_stats
+from utils.ratelimit import RateLimiter, call_with_floodwait
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    One slot per second for the next `size` seconds. Adding, cancelling
+    and collecting what expired are O(1) per entry, however many are pending.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.slots = [set() for _ in range(size)]
+        self.tick = int(time.time())
+
+    def reset(self, now: int):
+        for slot in self.slots:
+            slot.clear()
+        self.tick = now
+
+    def add(self, key, deadline: int) -> int:
+        deadline = min(max(deadline, self.tick + 1), self.tick + self.size - 1)
+        self.slots[deadline % self.size].add(key)
+        return deadline
+
+    def discard(self, key, deadline: int):
+        self.slots[deadline % self.size].discard(key)
+
+    def advance(self, now: int) -> list:
+        # After a long stall every slot is due once, not once per lap
+        self.tick = max(self.tick, now - self.size)
+        expired = []
+        while self.tick < now:
+            self.tick += 1
+            slot = self.slots[self.tick % self.size]
+            if slot:
+                expired.extend(slot)
+                slot.clear()
+        return expired
+
+
+class CaptchaStore:
+    """
+    Pending join challenges: (chat_id, user_id) -> (deadline, answer, message_id).
+
+    Expirations go through a timer wheel and are kicked by a rate limited
+    worker. Changes reach MongoDB write-behind every `flush_interval`
+    seconds, coalesced per user, so someone solving quickly never costs a write.
+    """
+
+    def __init__(self, max_timeout: int, flush_interval: int, kick_rate: float):
+        self.max_timeout = max_timeout
+        self.flush_interval = flush_interval
+        self.limiter = RateLimiter(kick_rate)
+        self.client = None
+        self.loaded = False
+        self._pending = {}
+        self._wheel = TimerWheel(max_timeout + 2)
+        self._dirty = {}                 # key -> doc to upsert, or None to delete
+        self._expired = asyncio.Queue()
+        self._tasks = []
+
+    # ==========================================================
+    # public api
+    # ==========================================================
+    def add(self, chat_id: int, user_id: int, answer: int, message_id: int, timeout: int):
+        key = (chat_id, user_id)
+        self.pop(chat_id, user_id)
+        deadline = self._wheel.add(key, int(time.time()) + min(timeout, self.max_timeout))
+        self._pending[key] = (deadline, answer, message_id)
+        self._dirty[key] = {
+            "chat_id": chat_id, "user_id": user_id,
+            "deadline": deadline, "answer": answer, "message_id": message_id,
+        }
+
+    def get(self, chat_id: int, user_id: int):
+        return self._pending.get((chat_id, user_id))
+
+    def pop(self, chat_id: int, user_id: int):
+        key = (chat_id, user_id)
+        entry = self._pending.pop(key, None)
+        if entry:
+            self._wheel.discard(key, entry[0])
+            self._dirty[key] = None
+        return entry
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def start(self, client):
+        self.client = client
+        # Loops first: expirations and answers keep working even if the restore fails
+        if not self._tasks:
+            # Count from now, not from import: re-place anything added before start
+            self._wheel.reset(int(time.time()))
+            for key, (deadline, answer, message_id) in self._pending.items():
+                self._pending[key] = (self._wheel.add(key, deadline), answer, message_id)
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._run()), loop.create_task(self._kick_worker())]
+
+        now = int(time.time())
+        async for doc in db.iter_captcha_pending():
+            key = (doc["chat_id"], doc["user_id"])
+            # Known here, or changed since MongoDB last saw it
+            if key in self._pending or key in self._dirty:
+                continue
+            # Already overdue: expires on the first tick
+            deadline = self._wheel.add(key, max(doc["deadline"], now + 1))
+            self._pending[key] = (deadline, doc["answer"], doc["message_id"])
+        self.loaded = True
+        return f"{len(self._pending)} pending"
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        upserts = [doc for doc in dirty.values() if doc]
+        deletes = [key for key, doc in dirty.items() if doc is None]
+        try:
+            await db.save_captcha_pending(upserts, deletes)
+        except Exception as e:
+            logger.error(f"Captcha store flush failed ({len(dirty)} changes): {e}")
+            # Newer changes made during the write win
+            self._dirty = {**dirty, **self._dirty}
+
+    # ==========================================================
+    # loop
+    # ==========================================================
+    async def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                await asyncio.sleep(1)
+                for key in self._wheel.advance(int(time.time())):
+                    entry = self._pending.pop(key, None)
+                    if entry:
+                        self._dirty[key] = None
+                        self._expired.put_nowait((key, entry[2]))
+
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    last_flush = time.monotonic()
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Captcha loop error: {e}")
+
+    async def _kick_worker(self):
+        while True:
+            (chat_id, user_id), message_id = await self._expired.get()
+            await self.limiter.acquire()
+            try:
+                await call_with_floodwait(self.client.ban_chat_member, chat_id, user_id)
+                await call_with_floodwait(self.client.unban_chat_member, chat_id, user_id)
+                chat_stats.record(chat_id, "captcha_kicks")
+            except Exception as e:
+                logger.error(f"Captcha timeout kick failed in {chat_id}: {e}")
+            try:
+                await self.client.delete_messages(chat_id, message_id)
+            except Exception:
+                pass
+
+
+captcha = CaptchaStore(CAPTCHA_MAX_TIMEOUT, CAPTCHA_FLUSH_INTERVAL, CAPTCHA_KICK_RATE)
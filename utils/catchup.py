@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from config import CATCHUP_STALE_AFTER, CATCHUP_QUIET
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Telegram's delete_messages limit per call
+DELETE_BATCH = 100
+
+
+class CatchUp:
+    """
+    Backlog mode after downtime. An update older than `stale_after`
+    seconds is part of the replayed backlog: handlers skip replies and
+    welcomes for it and deletions are batched per chat. Live processing
+    resumes once no stale update has been seen for `quiet` seconds.
+    """
+
+    def __init__(self, stale_after: int, quiet: int):
+        self.stale_after = stale_after
+        self.quiet = quiet
+        self.active = False
+        self.client = None
+        self._started = 0.0
+        self._last_stale = 0.0
+        self._stale_updates = 0
+        self._skipped = Counter()
+        self._deleted = 0
+        self._delete_calls = 0
+        self._deletes = defaultdict(list)   # chat_id -> message ids
+        self._flusher = None
+
+    def is_stale(self, update) -> bool:
+        date = getattr(update, "date", None)
+        return date is not None and (datetime.now() - date).total_seconds() > self.stale_after
+
+    def observe(self, update):
+        """Called by the gate for every update."""
+        now = time.monotonic()
+        if self.is_stale(update):
+            if not self.active:
+                self.active = True
+                self._started = now
+                logger.info("⏪ Update backlog detected, entering catch-up mode")
+            self._last_stale = now
+            self._stale_updates += 1
+        elif self.active and now - self._last_stale >= self.quiet:
+            self._finish(now)
+
+    def skip(self, update, kind: str) -> bool:
+        """True (and counted) when `update` is from the backlog."""
+        if not self.is_stale(update):
+            return False
+        self._skipped[kind] += 1
+        metrics.inc("catchup_skipped", kind=kind)
+        return True
+
+    async def delete(self, client, message):
+        """Delete now when live; queue into per-chat batches while catching up."""
+        if not self.is_stale(message):
+            return await message.delete()
+
+        self.client = client
+        ids = self._deletes[message.chat.id]
+        ids.append(message.id)
+        if len(ids) >= DELETE_BATCH:
+            await self._delete_batch(message.chat.id)
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(1)
+        for chat_id in list(self._deletes):
+            await self._delete_batch(chat_id)
+
+    async def _delete_batch(self, chat_id: int):
+        ids = self._deletes.pop(chat_id, None)
+        if not ids:
+            return
+        try:
+            await self.client.delete_messages(chat_id, ids)
+            self._deleted += len(ids)
+            self._delete_calls += 1
+        except Exception as e:
+            logger.error(f"Catch-up batch delete failed in {chat_id}: {e}")
+
+    def _finish(self, now: float):
+        duration = now - self._started
+        skipped = ", ".join(f"{n} {kind}" for kind, n in self._skipped.most_common()) or "nothing"
+        logger.info(
+            f"⏩ Caught up in {duration:.1f}s: {self._stale_updates} stale updates, skipped {skipped}, "
+            f"{self._deleted} messages deleted in {self._delete_calls} batches"
+        )
+        metrics.set("catchup_seconds", round(duration, 3))
+        metrics.inc("catchup_stale_updates", self._stale_updates)
+        metrics.inc("catchup_deleted", self._deleted)
+
+        self.active = False
+        self._stale_updates = 0
+        self._skipped.clear()
+        self._deleted = self._delete_calls = 0
+
+
+catchup = CatchUp(CATCHUP_STALE_AFTER, CATCHUP_QUIET)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import db
+from config import STATS_FLUSH_INTERVAL, STATS_TOP_USERS
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    """
+    Top-k heavy hitters in k counters (Metwally et al.). A new item takes
+    over the smallest counter and inherits its count, so every true top-k
+    item is kept and counts overestimate by at most `total / k`.
+    """
+
+    __slots__ = ("k", "counts")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.counts = {}
+
+    def add(self, item, count: int = 1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.k:
+            counts[item] = count
+        else:
+            victim = min(counts, key=counts.__getitem__)
+            counts[item] = counts.pop(victim) + count
+
+    def top(self, n: int) -> list:
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+class ChatStats:
+    """
+    Per-chat activity counters aggregated in memory per hour and written
+    as one `$inc` bulk write every `flush_interval` seconds. Only the
+    Space-Saving top users of each chat are written, so a bucket document
+    stays bounded however many people talk.
+    """
+
+    def __init__(self, flush_interval: int, top_users: int):
+        self.flush_interval = flush_interval
+        self.top_users = top_users
+        self._counts = defaultdict(Counter)   # (chat_id, bucket) -> {field: n}
+        self._users = {}                      # (chat_id, bucket) -> SpaceSaving
+        self._flusher = None
+
+    @staticmethod
+    def bucket(now: datetime = None) -> datetime:
+        return (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+    def record(self, chat_id: int, field: str, count: int = 1):
+        self._counts[(chat_id, self.bucket())][field] += count
+        self._ensure_flusher()
+
+    def message(self, chat_id: int, user_id: int = None):
+        key = (chat_id, self.bucket())
+        self._counts[key]["messages"] += 1
+        if user_id:
+            users = self._users.get(key)
+            if users is None:
+                users = self._users[key] = SpaceSaving(self.top_users)
+            users.add(user_id)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._counts:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self._counts:
+            return
+        counts, self._counts = self._counts, defaultdict(Counter)
+        users, self._users = self._users, {}
+
+        buckets = []
+        for key, fields in counts.items():
+            inc = {f"counts.{field}": n for field, n in fields.items()}
+            if key in users:
+                inc.update({f"users.{user_id}": n for user_id, n in users[key].counts.items()})
+            buckets.append((key[0], key[1], inc))
+
+        try:
+            await db.inc_chat_stats(buckets)
+        except Exception as e:
+            logger.error(f"Chat stats flush failed ({len(buckets)} buckets): {e}")
+            # Merge back; the next flush retries these increments
+            for key, fields in counts.items():
+                self._counts[key].update(fields)
+            for key, summary in users.items():
+                merged = self._users.setdefault(key, SpaceSaving(self.top_users))
+                for user_id, n in summary.counts.items():
+                    merged.add(user_id, n)
+
+    async def summary(self, chat_id: int, since: datetime) -> tuple:
+        """Totals and top users over the buckets since `since`."""
+        await self.flush()
+        totals, users = Counter(), Counter()
+        for doc in await db.get_chat_stats(chat_id, since):
+            totals.update(doc.get("counts", {}))
+            users.update(doc.get("users", {}))
+        return totals, users
+
+
+chat_stats = ChatStats(STATS_FLUSH_INTERVAL, STATS_TOP_USERS)
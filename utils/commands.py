@@ -0,0 +1,286 @@
+import asyncio
+import re
+
+from pyrogram import filters
+from pyrogram.enums import ChatMemberStatus
+
+from config import MAX_TARGETS, RESOLVE_CONCURRENCY
+from utils.admin_cache import admin_cache, ADMIN_STATUSES
+from utils.bot_perms import bot_perms, RIGHT_LABELS
+from utils.catchup import catchup
+from utils.durations import parse_duration
+from utils.user_cache import user_cache
+
+# Shared by every command: get_users is the most rate limited lookup
+_resolve_slots = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+ROLE_MEMBER = "member"
+ROLE_ADMIN = "admin"
+ROLE_OWNER = "owner"
+
+ROLE_DENIED = {
+    ROLE_ADMIN: "❌ Only admin can use this command.",
+    ROLE_OWNER: "❌ Only group owner can use this command.",
+}
+
+TARGET_ONE = "one"
+TARGET_MANY = "many"
+
+_TOKEN_RE = re.compile(r"\S+")
+
+
+# ==========================================================
+# argument converters: str -> value, ValueError when invalid
+# ==========================================================
+def choice(*options):
+    def convert(value: str) -> str:
+        value = value.lower()
+        if value not in options:
+            raise ValueError(value)
+        return value
+    return convert
+
+
+def duration(value: str) -> int:
+    seconds = parse_duration(value)
+    if not seconds:
+        raise ValueError(value)
+    return seconds
+
+
+def free_text(value: str) -> str:
+    """Everything left after the previous arguments, unsplit."""
+    return value
+
+
+free_text.rest = True
+
+
+def optional(convert):
+    def wrapper(value):
+        return None if value is None else convert(value)
+    wrapper.optional = True
+    wrapper.rest = getattr(convert, "rest", False)
+    return wrapper
+
+
+def parse_command(raw: str, bot_username: str):
+    """
+    `/cmd@Bot args` -> ("cmd", "args"). Commands addressed to another bot
+    and anything that is not a command give None.
+    """
+    if not raw or raw[0] != "/":
+        return None
+
+    parts = raw[1:].split(None, 1)
+    if not parts:
+        return None
+
+    name, _, addressee = parts[0].partition("@")
+    if addressee and addressee.lower() != bot_username:
+        return None
+    return name.lower(), parts[1] if len(parts) > 1 else ""
+
+
+class Command:
+    __slots__ = ("func", "name", "role", "right", "target", "args", "usage", "skip_stale")
+
+    def __init__(self, func, name, role, right, target, args, usage, skip_stale):
+        self.func = func
+        self.name = name
+        self.role = role
+        self.right = right
+        self.target = target
+        self.args = args
+        self.usage = usage
+        self.skip_stale = skip_stale
+
+
+class CommandContext:
+    """
+    One parsed command update. The sender's status, the targets and the
+    arguments are looked up once and shared by everything handling it.
+    """
+
+    __slots__ = ("client", "message", "chat_id", "user_id", "command", "text",
+                 "tokens", "targets", "args", "quiet", "_status")
+
+    def __init__(self, client, message, command: str, rest: str):
+        self.client = client
+        self.message = message
+        self.chat_id = message.chat.id
+        self.user_id = message.from_user.id if message.from_user else None
+        self.command = command
+        self.text = rest
+        self.tokens = [(m.group(), m.start()) for m in _TOKEN_RE.finditer(rest)]
+        self.targets = []
+        self.args = ()
+        self.quiet = False      # from the catch-up backlog: act, but do not answer
+        self._status = False
+
+    @property
+    def target(self):
+        return self.targets[0] if self.targets else None
+
+    @property
+    def words(self) -> list:
+        return [token for token, _ in self.tokens]
+
+    async def status(self):
+        if self._status is False:
+            self._status = None
+            if self.user_id:
+                self._status = await admin_cache.status(self.client, self.chat_id, self.user_id)
+        return self._status
+
+    async def is_admin(self) -> bool:
+        return await self.status() in ADMIN_STATUSES
+
+    async def is_owner(self) -> bool:
+        return await self.status() == ChatMemberStatus.OWNER
+
+    async def has_role(self, role: str) -> bool:
+        if role == ROLE_OWNER:
+            return await self.is_owner()
+        if role == ROLE_ADMIN:
+            return await self.is_admin()
+        return True
+
+    async def require_right(self, right: str) -> bool:
+        if await bot_perms.can(self.client, self.chat_id, right):
+            return True
+        await self.reply(f"⚠️ I need the '{RIGHT_LABELS[right]}' admin right to do that.")
+        return False
+
+    async def reply(self, content: str, **kwargs):
+        if self.quiet:
+            catchup.skip(self.message, "replies")
+            return None
+        return await self.message.reply_text(content, **kwargs)
+
+    # ==== targets: the replied user, else leading @username / user_id tokens
+    async def resolve_targets(self, mode: str) -> int:
+        reply = self.message.reply_to_message
+        if reply and reply.from_user:
+            self.targets = [reply.from_user]
+            if mode == TARGET_ONE:
+                return 0
+        if not self.tokens:
+            return 0
+
+        if mode == TARGET_ONE:
+            if self.targets:
+                return 0
+            user = await user_cache.resolve(self.client, self.tokens[0][0])
+            if user:
+                self.targets = [user]
+            return 1
+
+        refs = []
+        for token, _ in self.tokens[:MAX_TARGETS]:
+            if not (token.startswith("@") or token.isdigit()):
+                break
+            refs.append(token)
+        async def resolve(ref):
+            async with _resolve_slots:
+                return await user_cache.resolve(self.client, ref)
+
+        resolved = await asyncio.gather(*(resolve(ref) for ref in refs))
+
+        seen = {user.id for user in self.targets}
+        for user in resolved:
+            if user and user.id not in seen:
+                seen.add(user.id)
+                self.targets.append(user)
+        return len(refs)
+
+    def convert_args(self, converters: tuple, start: int):
+        values = []
+        position = start
+        for convert in converters:
+            if getattr(convert, "rest", False):
+                raw = self.text[self.tokens[position][1]:].strip() if position < len(self.tokens) else None
+                position = len(self.tokens)
+            else:
+                raw = self.tokens[position][0] if position < len(self.tokens) else None
+                position += 1
+            if raw is None and not getattr(convert, "optional", False):
+                raise ValueError("missing argument")
+            values.append(convert(raw))
+        self.args = tuple(values)
+
+
+class CommandRouter:
+    """
+    Every group command behind a single handler: the text is parsed once,
+    the command found with one dict lookup, and role, bot right, targets
+    and arguments checked from the declaration before the handler runs.
+    """
+
+    def __init__(self):
+        self._commands = {}
+
+    def command(self, *names, role: str = ROLE_ADMIN, right: str = None, target: str = None,
+                args: tuple = (), usage: str = None, skip_stale: bool = False):
+        """
+        `skip_stale` drops the command entirely when it comes from the
+        catch-up backlog; meant for read-only commands whose only effect is
+        the answer. Everything else still runs, with its replies suppressed.
+        """
+        def decorator(func):
+            spec = Command(func, names[0], role, right, target, args, usage, skip_stale)
+            for name in names:
+                if name in self._commands:
+                    raise ValueError(f"/{name} is already registered")
+                self._commands[name] = spec
+            return func
+        return decorator
+
+    def route(self, client, message):
+        parsed = parse_command(message.text, (client.me.username or "").lower())
+        if parsed and parsed[0] in self._commands:
+            return parsed
+        return None
+
+    async def _filter(self, _, client, message) -> bool:
+        parsed = self.route(client, message)
+        if not parsed:
+            return False
+        message.command = [parsed[0]] + parsed[1].split()
+        message.routed = parsed
+        return True
+
+    async def dispatch(self, client, message):
+        name, rest = message.routed
+        spec = self._commands[name]
+        # Actions sent while we were down still happen; answers hours late do not
+        stale = catchup.is_stale(message)
+        if stale and spec.skip_stale:
+            catchup.skip(message, "commands")
+            return
+
+        ctx = CommandContext(client, message, name, rest)
+        ctx.quiet = stale
+
+        if not await ctx.has_role(spec.role):
+            return await ctx.reply(ROLE_DENIED[spec.role])
+        if spec.right and not await ctx.require_right(spec.right):
+            return
+
+        consumed = 0
+        if spec.target:
+            consumed = await ctx.resolve_targets(spec.target)
+            if not ctx.targets:
+                return await ctx.reply(spec.usage)
+        try:
+            ctx.convert_args(spec.args, consumed)
+        except ValueError:
+            return await ctx.reply(spec.usage)
+
+        return await spec.func(ctx)
+
+    def attach(self, app, group: int = 0):
+        app.on_message(filters.group & filters.text & filters.create(self._filter), group=group)(self.dispatch)
+
+
+router = CommandRouter()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import (
+    ChannelInvalid,
+    ChannelPrivate,
+    ChatIdInvalid,
+    PeerIdInvalid,
+    UserNotParticipant,
+)
+
+import db
+from config import (
+    CHAT_DORMANT_DAYS,
+    USER_DEAD_DAYS,
+    COMPACT_INTERVAL,
+    COMPACT_BATCH,
+    COMPACT_PAUSE,
+    COMPACT_OP_TIMEOUT,
+    COMPACT_RATE,
+)
+from utils.metrics import metrics
+from utils.ratelimit import RateLimiter, call_with_floodwait
+
+logger = logging.getLogger(__name__)
+
+# The bot is not in the chat any more, or the chat is gone
+GONE_ERRORS = (ChannelInvalid, ChannelPrivate, ChatIdInvalid, PeerIdInvalid, UserNotParticipant)
+GONE_STATUSES = (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED)
+
+# Delay before the first pass so it never overlaps warm-up
+FIRST_RUN_DELAY = 600
+
+
+class Compactor:
+    """
+    Periodic removal of data nobody will read again.
+
+    Chats silent for `dormant_days` are checked against Telegram and purged
+    when the bot is no longer a member; users who blocked the bot more than
+    `dead_days` ago are dropped. Both are found through indexed range queries
+    and deleted `batch` at a time with a pause in between, so a pass never
+    competes with live traffic for the connection pool.
+
+    Deletes run one collection at a time under `op_timeout`, outside the
+    storage breaker. A timeout halves the batch for the rest of the pass.
+    """
+
+    def __init__(self, interval: int, batch: int, pause: float, rate: float,
+                 dormant_days: int, dead_days: int, op_timeout: float):
+        self.interval = interval
+        self.batch = batch
+        self.pause = pause
+        self.op_timeout = op_timeout
+        self._batch = batch
+        self.limiter = RateLimiter(rate)
+        self.dormant = timedelta(days=dormant_days)
+        self.dead = timedelta(days=dead_days)
+        self.client = None
+        self._task = None
+
+    async def start(self, client):
+        self.client = client
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return f"every {self.interval}s"
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(FIRST_RUN_DELAY)
+        while True:
+            try:
+                await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Compaction failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    # ==========================================================
+    # one pass
+    # ==========================================================
+    async def compact(self):
+        # Live traffic is already struggling: leave MongoDB alone this time
+        if db.breaker.state != "closed":
+            logger.info("🧹 Compaction skipped, MongoDB circuit is not closed")
+            return
+        started = datetime.utcnow()
+        self._batch = self.batch
+        deleted = Counter()
+        chats = await self._compact_chats(started - self.dormant, deleted)
+        users = await self._compact_users(started - self.dead, deleted)
+
+        total = sum(deleted.values())
+        sizes = await db.avg_object_sizes(deleted) if total else {}
+        reclaimed = sum(count * sizes.get(name, 0) for name, count in deleted.items())
+
+        metrics.inc("compact_runs")
+        metrics.inc("compact_deleted_docs", total)
+        metrics.inc("compact_reclaimed_bytes", reclaimed)
+        logger.info(
+            f"🧹 Compaction removed {chats} chats and {users} users: {total} documents, "
+            f"~{reclaimed / 1024:.0f} KiB in {(datetime.utcnow() - started).total_seconds():.1f}s"
+        )
+
+    async def _compact_chats(self, seen_before: datetime, deleted: Counter) -> int:
+        purged = 0
+        while True:
+            chat_ids = await db.get_dormant_chats(seen_before, self._batch)
+            if not chat_ids:
+                return purged
+
+            gone, alive = [], []
+            for chat_id in chat_ids:
+                (gone if await self._is_gone(chat_id) else alive).append(chat_id)
+
+            if gone:
+                db.forget_chats(gone)
+                for collection in db.CHAT_COLLECTIONS:
+                    deleted[collection] += await self._delete(db.delete_chat_docs, collection, gone)
+                purged += len(gone)
+            # Still a member, just quiet: skip it until it is dormant again
+            if alive:
+                await db.mark_chats_seen(alive)
+            await asyncio.sleep(self.pause)
+
+    async def _compact_users(self, blocked_before: datetime, deleted: Counter) -> int:
+        purged = 0
+        while True:
+            user_ids = await db.get_dead_users(blocked_before, self._batch)
+            if not user_ids:
+                return purged
+            for collection in db.USER_COLLECTIONS:
+                deleted[collection] += await self._delete(db.delete_user_docs, collection, user_ids)
+            purged += len(user_ids)
+            await asyncio.sleep(self.pause)
+
+    async def _delete(self, delete, collection: str, ids: list) -> int:
+        """delete_many in slices of the current batch size, halving it on timeout."""
+        removed = 0
+        pending = ids
+        while pending:
+            chunk = pending[:self._batch]
+            try:
+                removed += await asyncio.wait_for(delete(collection, chunk), self.op_timeout)
+            except asyncio.TimeoutError:
+                if self._batch == 1:
+                    raise
+                self._batch = max(1, self._batch // 2)
+                metrics.inc("compact_batch_shrunk")
+                logger.warning(f"Compaction delete on {collection} timed out, batch now {self._batch}")
+                continue
+            pending = pending[len(chunk):]
+        return removed
+
+    async def _is_gone(self, chat_id: int) -> bool:
+        await self.limiter.acquire()
+        try:
+            member = await call_with_floodwait(self.client.get_chat_member, chat_id, "me")
+        except GONE_ERRORS:
+            return True
+        except Exception as e:
+            # Unknown failure: keep the data rather than guess
+            logger.warning(f"Membership check failed for {chat_id}: {e}")
+            return False
+        return member.status in GONE_STATUSES
+
+
+compactor = Compactor(
+    COMPACT_INTERVAL, COMPACT_BATCH, COMPACT_PAUSE, COMPACT_RATE,
+    CHAT_DORMANT_DAYS, USER_DEAD_DAYS, COMPACT_OP_TIMEOUT,
+)
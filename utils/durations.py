@@ -0,0 +1,27 @@
+import re
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_DURATION_RE = re.compile(r"(\d+)([smhdw])")
+
+
+def parse_duration(text: str):
+    """Parse `90s`, `30m`, `2h`, `7d`, `1w` or combos like `1d12h` into seconds."""
+    if not text:
+        return None
+
+    text = text.lower()
+    parts = _DURATION_RE.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        return None
+
+    seconds = sum(int(n) * _UNITS[u] for n, u in parts)
+    return seconds or None
+
+
+def format_duration(seconds: int) -> str:
+    out = []
+    for unit, size in (("w", 604800), ("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= size:
+            out.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return "".join(out) or "0s"
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+
+from pyrogram.errors import FloodWait
+
+from utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class BatchExecutor:
+    """
+    Runs one API call per item with bounded concurrency.
+
+    A FloodWait seen by any worker pauses all of them until it expires,
+    instead of every worker running into the same wait on its own.
+    """
+
+    def __init__(self, concurrency: int, rate: float = None, retries: int = 3):
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self._resume_at = 0.0
+
+    async def _call(self, func, item):
+        for attempt in range(self.retries):
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.limiter:
+                await self.limiter.acquire()
+
+            try:
+                return await func(item)
+            except FloodWait as e:
+                logger.warning(f"FloodWait {e.value}s in batch, pausing all workers")
+                self._resume_at = max(self._resume_at, time.monotonic() + e.value + 1)
+                if attempt == self.retries - 1:
+                    raise
+
+    async def run(self, items: list, func, progress=None) -> list:
+        """
+        Returns [(item, result, error)] in input order. `progress(completed, total)`
+        is awaited after each item.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = [None] * len(items)
+        completed = 0
+
+        async def worker(index, item):
+            nonlocal completed
+            async with semaphore:
+                try:
+                    results[index] = (item, await self._call(func, item), None)
+                except Exception as e:
+                    results[index] = (item, None, e)
+            completed += 1
+            if progress:
+                await progress(completed, len(items))
+
+        await asyncio.gather(*(worker(i, item) for i, item in enumerate(items)))
+        return results
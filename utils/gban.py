@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from hashlib import blake2b
+
+import db
+from config import GBAN_SYNC_INTERVAL, GBAN_BLOOM_THRESHOLD, GBAN_FANOUT_RATE
+from utils.ratelimit import RateLimiter, call_with_floodwait
+
+logger = logging.getLogger(__name__)
+
+# Re-read a little behind the last sync to tolerate clock skew between instances
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, user_id: int):
+        digest = int.from_bytes(blake2b(user_id.to_bytes(8, "little", signed=True), digest_size=16).digest(), "little")
+        h1, h2 = digest & 0xFFFFFFFFFFFFFFFF, digest >> 64 | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, user_id: int):
+        for pos in self._positions(user_id):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, user_id: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(user_id))
+
+
+class GbanIndex:
+    """
+    In-memory view of the global ban list.
+
+    Small lists are a plain set. Past `bloom_threshold` entries a Bloom
+    filter answers "definitely not banned" in O(1) and the rare positives
+    are confirmed against MongoDB through a small LRU.
+    """
+
+    def __init__(self, sync_interval: int, bloom_threshold: int, fanout_rate: float):
+        self.sync_interval = sync_interval
+        self.bloom_threshold = bloom_threshold
+        self.limiter = RateLimiter(fanout_rate)
+        self._ids = set()
+        self._bloom = None
+        self._confirmed = OrderedDict()   # user_id -> bool (bloom mode / warm-up)
+        self._synced_at = datetime.min
+        self._loaded = False
+        self._task = None
+
+    # ==========================================================
+    # lookups
+    # ==========================================================
+    async def is_banned(self, user_id: int) -> bool:
+        # Still warming up: confirm against MongoDB like a bloom positive
+        if not self._loaded:
+            if user_id in self._ids:
+                return True
+        elif self._bloom is None:
+            return user_id in self._ids
+        elif user_id not in self._bloom:
+            return False
+
+        cached = self._confirmed.get(user_id)
+        if cached is None:
+            cached = await db.get_gban(user_id) is not None
+            self._remember(user_id, cached)
+        else:
+            self._confirmed.move_to_end(user_id)
+        return cached
+
+    def _remember(self, user_id: int, banned: bool):
+        self._confirmed[user_id] = banned
+        self._confirmed.move_to_end(user_id)
+        if len(self._confirmed) > 10000:
+            self._confirmed.popitem(last=False)
+
+    # ==========================================================
+    # local changes
+    # ==========================================================
+    def add(self, user_id: int):
+        if self._bloom is None:
+            self._ids.add(user_id)
+        else:
+            self._bloom.add(user_id)
+        if user_id in self._confirmed or self._bloom is not None:
+            self._remember(user_id, True)
+
+    def discard(self, user_id: int):
+        if self._bloom is None:
+            self._ids.discard(user_id)
+        if user_id in self._confirmed or self._bloom is not None:
+            self._remember(user_id, False)
+
+    # ==========================================================
+    # load + incremental sync
+    # ==========================================================
+    async def load(self):
+        total = await db.count_gbans()
+        if total > self.bloom_threshold and self._bloom is None:
+            self._bloom = BloomFilter(total * 2)
+            # A retried load may have synced into the set already: read everything again
+            self._synced_at = datetime.min
+        await self.sync()
+        self._loaded = True
+        self._confirmed.clear()
+        return f"{total} bans in {'bloom filter' if self._bloom else 'set'}"
+
+    async def sync(self):
+        since = self._synced_at - SYNC_OVERLAP if self._synced_at != datetime.min else self._synced_at
+        async for doc in db.iter_gban_changes(since):
+            if doc.get("active"):
+                self.add(doc["user_id"])
+            else:
+                self.discard(doc["user_id"])
+            self._synced_at = max(self._synced_at, doc["updated_at"])
+
+    async def start(self):
+        # The loop runs even if this load fails; it keeps loading until one succeeds
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sync_loop())
+        return await self.load()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await (self.sync() if self._loaded else self.load())
+            except Exception as e:
+                logger.error(f"Global ban sync failed: {e}")
+
+    # ==========================================================
+    # fan-out
+    # ==========================================================
+    async def fan_out(self, client, user_id: int, ban: bool = True) -> tuple:
+        """Apply (or lift) the ban in every registered chat; returns (done, failed)."""
+        action = client.ban_chat_member if ban else client.unban_chat_member
+        done = failed = 0
+
+        async for chat_id in db.iter_chat_ids():
+            await self.limiter.acquire()
+            try:
+                await call_with_floodwait(action, chat_id, user_id)
+                done += 1
+            except Exception as e:
+                failed += 1
+                logger.debug(f"Global ban fan-out failed in {chat_id}: {e}")
+
+        return done, failed
+
+
+gban_index = GbanIndex(GBAN_SYNC_INTERVAL, GBAN_BLOOM_THRESHOLD, GBAN_FANOUT_RATE)
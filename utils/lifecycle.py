@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+
+import db
+from config import SHUTDOWN_DEADLINE
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# A failed warm-up hook is retried with backoff until it succeeds
+WARMUP_RETRY_BASE = 2
+WARMUP_RETRY_MAX = 60
+
+
+class Lifecycle:
+    """
+    Startup / shutdown orchestration.
+
+    Startup only connects to Telegram; everything that needs MongoDB is a
+    warm-up hook run in the background while updates are already flowing.
+    Shutdown stops intake first, then drains background work and
+    write-behind buffers within `deadline` seconds before disconnecting.
+    """
+
+    def __init__(self, deadline: int):
+        self.deadline = deadline
+        self.accepting = False
+        self.warm = False
+        self._warmups = []
+        self._shutdowns = []
+        self._tasks = set()
+        self._stopping = asyncio.Event()
+
+    def on_warmup(self, name: str, func):
+        self._warmups.append((name, func))
+
+    def on_shutdown(self, name: str, func):
+        self._shutdowns.append((name, func))
+
+    def spawn(self, coro):
+        """Run a background job that shutdown will wait for."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ==========================================================
+    # startup
+    # ==========================================================
+    async def start(self, client, started_at: float):
+        await client.start()
+        self.accepting = True
+
+        elapsed = time.perf_counter() - started_at
+        metrics.set("startup_seconds", round(elapsed, 3))
+        logger.info(f"🚀 Accepting updates {elapsed:.2f}s after launch")
+
+        self.spawn(self._warm_up(started_at))
+
+    async def _warm_up(self, started_at: float):
+        async def run(name, func):
+            begin = time.perf_counter()
+            attempt = 0
+            while not self._stopping.is_set():
+                try:
+                    result = await func()
+                    logger.info(f"🔥 Warm-up {name} done in {time.perf_counter() - begin:.2f}s ({result})")
+                    return
+                except Exception as e:
+                    delay = min(WARMUP_RETRY_BASE * 2 ** attempt, WARMUP_RETRY_MAX)
+                    attempt += 1
+                    metrics.inc("warmup_retries", hook=name)
+                    logger.error(f"Warm-up {name} failed (attempt {attempt}), retrying in {delay}s: {e}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+        await asyncio.gather(*(run(name, func) for name, func in self._warmups))
+        self.warm = True
+        metrics.set("warmup_seconds", round(time.perf_counter() - started_at, 3))
+
+    # ==========================================================
+    # shutdown
+    # ==========================================================
+    async def shutdown(self, client):
+        self.accepting = False
+        self._stopping.set()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        logger.info("🛑 Intake stopped, draining...")
+
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=max(deadline - loop.time(), 0))
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Cancelled {len(pending)} background jobs at shutdown deadline")
+
+        for name, func in self._shutdowns:
+            try:
+                await asyncio.wait_for(func(), timeout=max(deadline - loop.time(), 0.1))
+            except asyncio.TimeoutError:
+                logger.warning(f"Shutdown step {name} hit the deadline")
+            except Exception as e:
+                logger.error(f"Shutdown step {name} failed: {e}")
+
+        await client.stop()
+        db.close()
+        logger.info("👋 Shutdown complete")
+
+
+lifecycle = Lifecycle(SHUTDOWN_DEADLINE)
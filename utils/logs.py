@@ -0,0 +1,206 @@
+import atexit
+import contextvars
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from config import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMIT,
+    LOG_RATE_OVERRIDES,
+    LOG_SAMPLING,
+)
+from utils.metrics import metrics
+
+# Set once per update by the gate; copied into tasks spawned while handling it
+update_context = contextvars.ContextVar("update_context", default=None)
+
+_trace_prefix = f"{os.getpid() & 0xffff:04x}{random.getrandbits(16):04x}"
+_trace_ids = itertools.count(1)
+
+_UPDATE_TYPES = {
+    "Message": "message",
+    "CallbackQuery": "callback_query",
+    "ChatMemberUpdated": "chat_member",
+}
+
+_listener = None
+
+
+def bind_update(update):
+    """Give the update being handled a trace ID and its chat / user for log records."""
+    chat = getattr(update, "chat", None)
+    if chat is None and getattr(update, "message", None) is not None:
+        chat = update.message.chat
+    user = getattr(update, "from_user", None)
+
+    update_context.set({
+        "trace": f"{_trace_prefix}-{next(_trace_ids):x}",
+        "update": _UPDATE_TYPES.get(type(update).__name__, type(update).__name__),
+        "chat_id": chat.id if chat else None,
+        "user_id": user.id if user else None,
+    })
+
+
+def _parse_module_map(spec: str, cast) -> dict:
+    """`handlers.group_commands=5,pyrogram=1` -> {"handlers.group_commands": 5, ...}"""
+    out = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        out[name.strip()] = cast(value)
+    return out
+
+
+def _lookup(table: dict, name: str, default):
+    # Most specific logger prefix wins: a.b.c, then a.b, then a
+    while name:
+        if name in table:
+            return table[name]
+        name = name.rpartition(".")[0]
+    return default
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Caps records per call site to `limit` a minute (per-module overrides),
+    and keeps only a sampled share of records below WARNING where a
+    module is configured for it. Drops are counted and the next record
+    let through from that call site says how many were skipped.
+    """
+
+    def __init__(self, limit: int, overrides: dict, sampling: dict):
+        super().__init__()
+        self.limit = limit
+        self.overrides = overrides
+        self.sampling = sampling
+        self._windows = {}   # (logger, lineno) -> [window_start, count, suppressed]
+
+    def filter(self, record) -> bool:
+        if self.sampling and record.levelno < logging.WARNING:
+            rate = _lookup(self.sampling, record.name, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                metrics.inc("log_sampled_out")
+                return False
+
+        limit = _lookup(self.overrides, record.name, self.limit)
+        if limit <= 0:
+            return True
+
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= 60:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+
+        if window[1] >= limit:
+            window[2] += 1
+            metrics.inc("log_rate_limited")
+            return False
+        window[1] += 1
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Captures the update context on the event loop and never blocks on a full queue."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        context = update_context.get()
+        if context:
+            record.__dict__.update(context)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_dropped")
+
+
+class JsonFormatter(logging.Formatter):
+    FIELDS = ("trace", "update", "chat_id", "user_id", "suppressed")
+
+    def format(self, record) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                out[field] = value
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("[%(levelname)s] %(asctime)s %(name)s - %(message)s")
+
+    def format(self, record) -> str:
+        line = super().format(record)
+        if getattr(record, "trace", None):
+            line += f" [trace={record.trace} chat={record.chat_id} user={record.user_id}]"
+        if getattr(record, "suppressed", None):
+            line += f" (+{record.suppressed} suppressed)"
+        return line
+
+
+def setup_logging():
+    """
+    One logging setup for the process: records are queued on the event
+    loop and written by a QueueListener thread, so slow stderr never
+    stalls update handling.
+    """
+    global _listener
+    if _listener:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(
+        LOG_RATE_LIMIT,
+        _parse_module_map(LOG_RATE_OVERRIDES, int),
+        _parse_module_map(LOG_SAMPLING, float),
+    ))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush what is still queued; safe to call more than once."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,41 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Process-wide counters and gauges, rendered in Prometheus text format."""
+
+    def __init__(self, prefix: str = "nomade"):
+        self.prefix = prefix
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        # Rendered from the health server thread
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def get(self, name: str, **labels) -> float:
+        key = self._key(name, labels)
+        with self._lock:
+            return self._gauges.get(key, self._counters.get(key, 0))
+
+    def _key(self, name: str, labels: dict) -> str:
+        if not labels:
+            return f"{self.prefix}_{name}"
+        rendered = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+        return f"{self.prefix}_{name}{{{rendered}}}"
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [f"{key} {value}" for key, value in sorted(self._counters.items())]
+            lines += [f"{key} {value}" for key, value in sorted(self._gauges.items())]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import time
+
+from pyrogram.errors import FloodWait
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def call_with_floodwait(func, *args, retries: int = 3, **kwargs):
+    """Await `func(*args, **kwargs)`, sleeping through FloodWait up to `retries` times."""
+    for attempt in range(retries):
+        try:
+            return await func(*args, **kwargs)
+        except FloodWait as e:
+            if attempt == retries - 1:
+                raise
+            logger.warning(f"FloodWait {e.value}s on {getattr(func, '__name__', func)}")
+            await asyncio.sleep(e.value + 1)
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from pyrogram.types import ChatPermissions
+
+import db
+from config import SCHEDULER_HORIZON, SCHEDULER_BATCH_SIZE, SCHEDULER_RATE
+from utils.audit import audit
+from utils.ratelimit import RateLimiter, call_with_floodwait
+
+logger = logging.getLogger(__name__)
+
+# Telegram lifts restrictions itself when until_date is within this window
+TELEGRAM_UNTIL_MIN = 30
+TELEGRAM_UNTIL_MAX = 366 * 86400
+
+# A failed action is retried with exponential backoff, then dropped
+RETRY_BASE = 30
+RETRY_MAX = 3600
+MAX_ATTEMPTS = 8
+
+UNMUTE_PERMISSIONS = ChatPermissions(
+    can_send_messages=True,
+    can_send_media_messages=True,
+    can_send_other_messages=True,
+    can_add_web_page_previews=True,
+)
+
+
+# Sanctions lifted on schedule show up in the modlog; housekeeping does not
+AUDITED_ACTIONS = {"unmute", "unban"}
+
+
+def telegram_can_expire(seconds: int) -> bool:
+    return TELEGRAM_UNTIL_MIN < seconds < TELEGRAM_UNTIL_MAX
+
+
+class Scheduler:
+    """
+    Persistent expirations for timed sanctions.
+
+    MongoDB holds every pending action; the in-memory min-heap only holds
+    those due within `horizon` seconds and is refilled through the `due` index.
+    """
+
+    def __init__(self, horizon: int, batch_size: int, rate: float):
+        self.horizon = timedelta(seconds=horizon)
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate)
+        self.client = None
+        self._heap = []               # (due, _id)
+        self._queued = set()          # (due, _id) in the heap
+        self._loaded_until = datetime.min
+        self._refilling_until = datetime.min   # bound of the refill in flight
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._actions = {
+            "unmute": self._unmute,
+            "unban": self._unban,
+            "cleanup": self._cleanup,
+        }
+
+    # ==========================================================
+    # public api
+    # ==========================================================
+    async def start(self, client):
+        self.client = client
+        # The loop does the first refill itself and retries it on failure
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return "loop started"
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def schedule(self, chat_id: int, user_id: int, action: str, due: datetime):
+        job_id = await db.add_scheduled_action(chat_id, user_id, action, due)
+        # A refill in flight may have queried before this insert landed
+        if due <= max(self._loaded_until, self._refilling_until):
+            self._push(due, job_id)
+            self._wakeup.set()
+
+    async def cancel(self, chat_id: int, user_id: int, action: str):
+        # Heap entries are dropped lazily: a missing document means cancelled
+        await db.remove_scheduled_action(chat_id, user_id, action)
+
+    # ==========================================================
+    # heap
+    # ==========================================================
+    def _push(self, due: datetime, job_id):
+        # A job moved to another time gets a second entry; the stale one
+        # finds the document rescheduled or gone and is dropped in _process
+        entry = (due, job_id)
+        if entry in self._queued:
+            return
+        self._queued.add(entry)
+        heapq.heappush(self._heap, entry)
+
+    async def _refill(self, now: datetime):
+        until = now + self.horizon
+        limit = self.batch_size * 50
+        self._refilling_until = until
+        try:
+            docs = await db.get_scheduled_actions(self._loaded_until, until, limit)
+        finally:
+            self._refilling_until = datetime.min
+
+        for doc in docs:
+            self._push(doc["due"], doc["_id"])
+
+        # Window was truncated: only trust it up to the last loaded item
+        self._loaded_until = docs[-1]["due"] if len(docs) == limit else until
+
+    def _pop_due(self, now: datetime) -> list:
+        ids = []
+        while self._heap and self._heap[0][0] <= now and len(ids) < self.batch_size:
+            entry = heapq.heappop(self._heap)
+            self._queued.discard(entry)
+            ids.append(entry[1])
+        return ids
+
+    # ==========================================================
+    # loop
+    # ==========================================================
+    async def _run(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                if now + self.horizon / 2 >= self._loaded_until:
+                    await self._refill(now)
+
+                ids = self._pop_due(now)
+                if ids:
+                    await self._process(ids, now)
+                    continue
+
+                next_due = self._heap[0][0] if self._heap else self._loaded_until
+                timeout = (min(next_due, self._loaded_until - self.horizon / 2) - now).total_seconds()
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 1))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler loop error: {e}")
+                await asyncio.sleep(5)
+
+    async def _process(self, ids: list, now: datetime):
+        done = []
+        for doc in await db.get_scheduled_actions_by_ids(ids):
+            # Rescheduled to a later time since it was queued
+            if doc["due"] > now:
+                if doc["due"] <= self._loaded_until:
+                    self._push(doc["due"], doc["_id"])
+                continue
+
+            handler = self._actions.get(doc["action"])
+            if handler:
+                await self.limiter.acquire()
+                try:
+                    await handler(doc["chat_id"], doc["user_id"])
+                    if doc["action"] in AUDITED_ACTIONS:
+                        audit.record(doc["chat_id"], f"auto_{doc['action']}", None, doc["user_id"])
+                except Exception as e:
+                    if await self._retry(doc, now, e):
+                        continue
+            done.append(doc["_id"])
+
+        if done:
+            await db.delete_scheduled_actions(done)
+
+    async def _retry(self, doc: dict, now: datetime, error: Exception) -> bool:
+        """Reschedule a failed action with backoff; False once it is given up."""
+        attempts = doc.get("attempts", 0) + 1
+        if attempts >= MAX_ATTEMPTS:
+            logger.error(f"Scheduled {doc['action']} in {doc['chat_id']} given up after {attempts} attempts: {error}")
+            return False
+
+        due = now + timedelta(seconds=min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX))
+        logger.warning(f"Scheduled {doc['action']} failed in {doc['chat_id']}, retry {attempts} at {due}: {error}")
+        try:
+            await db.retry_scheduled_action(doc["_id"], due, attempts)
+        except Exception as e:
+            logger.error(f"Could not persist retry of {doc['_id']}: {e}")
+        # Queued here even if the write failed, so this process still retries
+        self._push(due, doc["_id"])
+        self._wakeup.set()
+        return True
+
+    # ==========================================================
+    # actions
+    # ==========================================================
+    async def _unmute(self, chat_id: int, user_id: int):
+        await call_with_floodwait(
+            self.client.restrict_chat_member, chat_id, user_id, permissions=UNMUTE_PERMISSIONS
+        )
+
+    async def _unban(self, chat_id: int, user_id: int):
+        await call_with_floodwait(self.client.unban_chat_member, chat_id, user_id)
+
+    async def _cleanup(self, chat_id: int, user_id: int):
+        # Scheduled when the bot is removed; cancelled if it is added back in time
+        await db.clear_group_data(chat_id)
+        logger.info(f"Cleared data of chat {chat_id} after removal")
+
+
+scheduler = Scheduler(SCHEDULER_HORIZON, SCHEDULER_BATCH_SIZE, SCHEDULER_RATE)
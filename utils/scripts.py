@@ -0,0 +1,126 @@
+from bisect import bisect_right
+from functools import lru_cache
+
+# Sorted, non-overlapping codepoint ranges -> script name.
+# Anything outside the table (digits, punctuation, emoji, spaces) is ignored.
+SCRIPT_RANGES = (
+    (0x0041, 0x005A, "latin"),
+    (0x0061, 0x007A, "latin"),
+    (0x00C0, 0x00D6, "latin"),
+    (0x00D8, 0x00F6, "latin"),
+    (0x00F8, 0x02AF, "latin"),
+    (0x0370, 0x03FF, "greek"),
+    (0x0400, 0x052F, "cyrillic"),
+    (0x0531, 0x058F, "armenian"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0x08A0, 0x08FF, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x10A0, 0x10FF, "georgian"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x1C80, 0x1C8F, "cyrillic"),
+    (0x1E00, 0x1EFF, "latin"),
+    (0x1F00, 0x1FFF, "greek"),
+    (0x2C60, 0x2C7F, "latin"),
+    (0x2DE0, 0x2DFF, "cyrillic"),
+    (0x2E80, 0x2FDF, "cjk"),
+    (0x3040, 0x309F, "kana"),
+    (0x30A0, 0x30FF, "kana"),
+    (0x3130, 0x318F, "hangul"),
+    (0x31F0, 0x31FF, "kana"),
+    (0x3400, 0x4DBF, "cjk"),
+    (0x4E00, 0x9FFF, "cjk"),
+    (0xA640, 0xA69F, "cyrillic"),
+    (0xA720, 0xA7FF, "latin"),
+    (0xA8E0, 0xA8FF, "devanagari"),
+    (0xAC00, 0xD7AF, "hangul"),
+    (0xF900, 0xFAFF, "cjk"),
+    (0xFB1D, 0xFB4F, "hebrew"),
+    (0xFB50, 0xFDFF, "arabic"),
+    (0xFE70, 0xFEFF, "arabic"),
+    (0xFF21, 0xFF3A, "latin"),
+    (0xFF41, 0xFF5A, "latin"),
+    (0xFF66, 0xFF9F, "kana"),
+    (0x20000, 0x2FA1F, "cjk"),
+)
+
+SCRIPTS = frozenset(name for _, _, name in SCRIPT_RANGES)
+
+_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+_ENDS = [end for _, end, _ in SCRIPT_RANGES]
+_NAMES = [name for _, _, name in SCRIPT_RANGES]
+
+# ASCII is most of the traffic: skip the bisect for it
+_ASCII = [("latin" if chr(cp).isalpha() else None) for cp in range(128)]
+
+
+def script_of(ch: str):
+    cp = ord(ch)
+    if cp < 128:
+        return _ASCII[cp]
+    i = bisect_right(_STARTS, cp) - 1
+    if i >= 0 and cp <= _ENDS[i]:
+        return _NAMES[i]
+    return None
+
+
+class ScriptLock:
+    """Flags text whose share of letters in blocked scripts exceeds `threshold`."""
+
+    __slots__ = ("blocked", "threshold")
+
+    def __init__(self, blocked: frozenset, threshold: float):
+        self.blocked = blocked
+        self.threshold = threshold
+
+    def violates(self, text: str) -> bool:
+        blocked = self.blocked
+        # Plain ASCII can only contain Latin letters
+        if text.isascii():
+            return "latin" in blocked and any(_ASCII[ord(ch)] for ch in text)
+
+        threshold = self.threshold
+        ascii_, starts, ends, names = _ASCII, _STARTS, _ENDS, _NAMES
+        bad = letters = 0
+        rest = len(text)
+
+        for ch in text:
+            rest -= 1
+            cp = ord(ch)
+            if cp < 128:
+                script = ascii_[cp]
+            else:
+                i = bisect_right(starts, cp) - 1
+                script = names[i] if i >= 0 and cp <= ends[i] else None
+            if script is None:
+                continue
+
+            letters += 1
+            if script in blocked:
+                bad += 1
+
+            # Blocked even if every remaining char is an allowed letter
+            if bad > threshold * (letters + rest):
+                return True
+            # Allowed even if every remaining char is a blocked letter
+            if bad + rest <= threshold * (letters + rest):
+                return False
+
+        return letters > 0 and bad > threshold * letters
+
+
+@lru_cache(maxsize=256)
+def compile_script_lock(mode: str, scripts: tuple, threshold: float) -> ScriptLock:
+    """`mode` is "allow" (block every other script) or "deny" (block the listed ones)."""
+    listed = frozenset(scripts)
+    blocked = SCRIPTS - listed if mode == "allow" else listed & SCRIPTS
+    return ScriptLock(blocked, threshold)
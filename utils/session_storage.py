@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+
+from pyrogram.storage import Storage
+from pyrogram.storage.sqlite_storage import get_input_peer
+
+import db
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("mongo", "file")
+
+# Same as Pyrogram's SQLite storage: older usernames are resolved again
+USERNAME_TTL = 86400
+
+# Peers per bulk write, so one snapshot never runs into the op timeout
+SNAPSHOT_CHUNK = 1000
+
+SESSION_FIELDS = ("dc_id", "api_id", "test_mode", "auth_key", "date", "user_id", "is_bot")
+
+
+class SnapshotStorage(Storage):
+    """
+    Pyrogram session held in memory.
+
+    Peers live in a dict keyed by id, with username and phone number
+    indexes, so lookups never touch the disk. The session is restored from
+    `backend` ("mongo" or "file") on open and written back every `interval`
+    seconds and on close: MongoDB receives only the peers changed since the
+    last snapshot, the file is rewritten atomically.
+    """
+
+    def __init__(self, name: str, backend: str, interval: int, path: str = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown session backend: {backend}")
+        super().__init__(name)
+        self.backend = backend
+        self.interval = interval
+        self.path = path
+        self._session = dict.fromkeys(SESSION_FIELDS)
+        self._session.update(dc_id=2, date=0)
+        self._peers = {}          # id -> (access_hash, type, username, phone_number, updated)
+        self._usernames = {}      # username -> id
+        self._phones = {}         # phone number -> id
+        self._dirty = set()       # peer ids changed since the last snapshot
+        self._session_dirty = False
+        self._task = None
+
+    # ==========================================================
+    # lifecycle (called by Pyrogram)
+    # ==========================================================
+    async def open(self):
+        started = time.perf_counter()
+        try:
+            await (self._restore_mongo() if self.backend == "mongo" else self._restore_file())
+        except Exception as e:
+            # An empty session only costs a fresh bot authorization
+            logger.error(f"Session restore from {self.backend} failed, starting empty: {e}")
+        logger.info(
+            f"🔑 Session restored from {self.backend}: {len(self._peers)} peers "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        self._task = asyncio.get_running_loop().create_task(self._snapshot_loop())
+
+    async def save(self):
+        await self.date(int(time.time()))
+        await self.snapshot()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.snapshot()
+
+    async def delete(self):
+        self._session = dict.fromkeys(SESSION_FIELDS)
+        self._peers.clear()
+        self._usernames.clear()
+        self._phones.clear()
+        self._dirty.clear()
+        if self.backend == "mongo":
+            await db.delete_session(self.name)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    # ==========================================================
+    # peers
+    # ==========================================================
+    async def update_peers(self, peers: list):
+        now = int(time.time())
+        for peer_id, access_hash, peer_type, username, phone_number in peers:
+            username = username.lower() if username else None
+            old = self._peers.get(peer_id)
+            if old and old[:4] == (access_hash, peer_type, username, phone_number):
+                # Unchanged: refresh the username age without a write
+                self._peers[peer_id] = (*old[:4], now)
+                continue
+            self._put(peer_id, access_hash, peer_type, username, phone_number, now)
+            self._dirty.add(peer_id)
+
+    def _put(self, peer_id, access_hash, peer_type, username, phone_number, updated):
+        old = self._peers.get(peer_id)
+        if old:
+            if old[2] and self._usernames.get(old[2]) == peer_id:
+                del self._usernames[old[2]]
+            if old[3] and self._phones.get(old[3]) == peer_id:
+                del self._phones[old[3]]
+        self._peers[peer_id] = (access_hash, peer_type, username, phone_number, updated)
+        if username:
+            self._usernames[username] = peer_id
+        if phone_number:
+            self._phones[phone_number] = peer_id
+
+    async def get_peer_by_id(self, peer_id: int):
+        peer = self._peers.get(peer_id)
+        if peer is None:
+            raise KeyError(f"ID not found: {peer_id}")
+        return get_input_peer(peer_id, peer[0], peer[1])
+
+    async def get_peer_by_username(self, username: str):
+        peer_id = self._usernames.get(username.lower())
+        if peer_id is None:
+            raise KeyError(f"Username not found: {username}")
+        access_hash, peer_type, _, _, updated = self._peers[peer_id]
+        if time.time() - updated > USERNAME_TTL:
+            raise KeyError(f"Username expired: {username}")
+        return get_input_peer(peer_id, access_hash, peer_type)
+
+    async def get_peer_by_phone_number(self, phone_number: str):
+        peer_id = self._phones.get(phone_number)
+        if peer_id is None:
+            raise KeyError(f"Phone number not found: {phone_number}")
+        access_hash, peer_type, *_ = self._peers[peer_id]
+        return get_input_peer(peer_id, access_hash, peer_type)
+
+    # ==========================================================
+    # session fields
+    # ==========================================================
+    def _field(self, name: str, value):
+        if value is object:
+            return self._session[name]
+        if self._session[name] != value:
+            self._session[name] = value
+            self._session_dirty = True
+
+    async def dc_id(self, value: int = object):
+        return self._field("dc_id", value)
+
+    async def api_id(self, value: int = object):
+        return self._field("api_id", value)
+
+    async def test_mode(self, value: bool = object):
+        return self._field("test_mode", value)
+
+    async def auth_key(self, value: bytes = object):
+        return self._field("auth_key", value)
+
+    async def date(self, value: int = object):
+        return self._field("date", value)
+
+    async def user_id(self, value: int = object):
+        return self._field("user_id", value)
+
+    async def is_bot(self, value: bool = object):
+        return self._field("is_bot", value)
+
+    # ==========================================================
+    # snapshots
+    # ==========================================================
+    async def snapshot(self):
+        if not self._dirty and not self._session_dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        session_dirty, self._session_dirty = self._session_dirty, False
+        try:
+            if self.backend == "mongo":
+                await self._save_mongo(dirty, session_dirty)
+            else:
+                await asyncio.to_thread(self._write_file, self._file_data())
+            metrics.set("session_peers", len(self._peers))
+        except Exception as e:
+            logger.error(f"Session snapshot to {self.backend} failed ({len(dirty)} peers): {e}")
+            self._dirty |= dirty
+            self._session_dirty = self._session_dirty or session_dirty
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.snapshot()
+
+    async def _save_mongo(self, dirty: set, session_dirty: bool):
+        if session_dirty:
+            await db.save_session(self.name, dict(self._session))
+        rows = [(peer_id, *self._peers[peer_id]) for peer_id in dirty if peer_id in self._peers]
+        for i in range(0, len(rows), SNAPSHOT_CHUNK):
+            await db.save_session_peers(self.name, rows[i:i + SNAPSHOT_CHUNK])
+
+    async def _restore_mongo(self):
+        doc = await db.load_session(self.name)
+        if doc:
+            self._session.update({field: doc.get(field) for field in SESSION_FIELDS})
+        async for peer in db.iter_session_peers(self.name):
+            self._put(peer["peer_id"], peer["access_hash"], peer["type"],
+                      peer["username"], peer["phone_number"], peer["updated"])
+
+    def _file_data(self) -> dict:
+        session = dict(self._session)
+        if session["auth_key"]:
+            session["auth_key"] = base64.b64encode(session["auth_key"]).decode()
+        return {
+            "session": session,
+            "peers": [[peer_id, *peer] for peer_id, peer in self._peers.items()],
+        }
+
+    def _write_file(self, data: dict):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    async def _restore_file(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        session = data["session"]
+        if session.get("auth_key"):
+            session["auth_key"] = base64.b64decode(session["auth_key"])
+        self._session.update({field: session.get(field) for field in SESSION_FIELDS})
+        for peer in data["peers"]:
+            self._put(*peer)
@@ -0,0 +1,58 @@
+import weakref
+
+import db
+from utils.metrics import metrics
+from utils.scripts import compile_script_lock
+
+
+class ChatEngine:
+    """
+    Compiled, read-only form of a chat's effective locks, welcome and
+    anti-cheater settings. Chats with identical settings share one instance.
+    """
+
+    __slots__ = ("key", "locks", "script_lock", "welcome_enabled", "welcome", "anticheater", "__weakref__")
+
+    def __init__(self, key: str, locks: dict, welcome: dict, anticheater: dict):
+        self.key = key
+        self.locks = frozenset(name for name, on in locks.get("locks", {}).items() if on)
+        self.script_lock = None
+        if "language" in self.locks:
+            lang = {**db.LANGUAGE_DEFAULTS, **locks.get("language", {})}
+            self.script_lock = compile_script_lock(lang["mode"], tuple(lang["scripts"]), lang["threshold"])
+        self.welcome_enabled = bool(welcome.get("enabled", True))
+        self.welcome = welcome.get("message")
+        self.anticheater = bool(anticheater.get("enabled", False))
+
+
+class EngineCache:
+    """
+    chat_id -> shared ChatEngine.
+
+    Engines are interned by the content hash of the settings they were
+    compiled from, so memory grows with distinct configs rather than with
+    chats. A chat's engine is rebuilt only when one of its cached settings
+    documents is replaced, which the identity check below detects.
+    """
+
+    def __init__(self):
+        self._interned = weakref.WeakValueDictionary()   # content hash -> engine
+        self._chats = {}                                 # chat_id -> (source docs, engine)
+
+    async def get(self, chat_id: int) -> ChatEngine:
+        sources = await db.get_chat_settings(chat_id)
+        memo = self._chats.get(chat_id)
+        if memo and all(a is b for a, b in zip(memo[0], sources)):
+            return memo[1]
+
+        key = db.settings_hash(dict(zip(db.PRESET_COLLECTIONS, sources)))
+        engine = self._interned.get(key)
+        if engine is None:
+            engine = ChatEngine(key, *sources)
+            self._interned[key] = engine
+            metrics.set("settings_engines", len(self._interned))
+        self._chats[chat_id] = (sources, engine)
+        return engine
+
+
+engines = EngineCache()
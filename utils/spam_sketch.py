@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import re
+import time
+from array import array
+from collections import OrderedDict, deque
+from hashlib import blake2b
+
+import db
+from config import (
+    SPAM_WAVE_THRESHOLD,
+    SPAM_WAVE_DECAY,
+    SPAM_WAVE_WIDTH,
+    SPAM_WAVE_DEPTH,
+    SPAM_WAVE_CHECKPOINT,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_TEXT_LENGTH = 16
+_NON_WORD = re.compile(r"\W+")
+
+
+class CountMinSketch:
+    """Fixed-size frequency sketch; counters are halved every `decay` seconds."""
+
+    def __init__(self, width: int, depth: int, decay: int):
+        self.width = width
+        self.depth = depth
+        self.decay = decay
+        self.counters = array("I", bytes(4 * width * depth))
+        self.decayed_at = time.time()
+
+    def _indexes(self, key: bytes):
+        digest = int.from_bytes(blake2b(key, digest_size=8).digest(), "little")
+        h1, h2 = digest & 0xFFFFFFFF, digest >> 32 | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def _maybe_decay(self):
+        now = time.time()
+        if now - self.decayed_at < self.decay:
+            return
+        halvings = int((now - self.decayed_at) // self.decay)
+        self.counters = array("I", (c >> halvings for c in self.counters))
+        self.decayed_at += halvings * self.decay
+
+    def add(self, key: bytes) -> int:
+        """Conservative update; returns the new estimate for `key`."""
+        self._maybe_decay()
+        counters = self.counters
+        indexes = self._indexes(key)
+        estimate = min(counters[i] for i in indexes) + 1
+        for i in indexes:
+            if counters[i] < estimate:
+                counters[i] = estimate
+        return estimate
+
+    def estimate(self, key: bytes) -> int:
+        self._maybe_decay()
+        return min(self.counters[i] for i in self._indexes(key))
+
+
+class SpamWaveDetector:
+    """
+    Counts in how many chats the same text or media shows up.
+
+    A fingerprint is counted once per chat; when it reaches `threshold`
+    chats the wave is flagged and every copy still in the recent window
+    is handed back for deletion.
+    """
+
+    def __init__(self, threshold: int, decay: int, width: int, depth: int, checkpoint: int):
+        self.threshold = threshold
+        self.checkpoint_interval = checkpoint
+        self.sketch = CountMinSketch(width, depth, decay)
+        self._seen = OrderedDict()               # (fingerprint, chat_id) -> None
+        self._recent = deque(maxlen=20000)       # (fingerprint, chat_id, message_id)
+        self._flagged = OrderedDict()            # fingerprint -> flagged at
+        self._task = None
+
+    @staticmethod
+    def fingerprint(message):
+        media = message.photo or message.video or message.animation or message.document
+        if media:
+            return b"m:" + media.file_unique_id.encode()
+
+        text = message.text or message.caption
+        if not text:
+            return None
+        normalized = _NON_WORD.sub("", text.casefold())
+        if len(normalized) < MIN_TEXT_LENGTH:
+            return None
+        return b"t:" + blake2b(normalized.encode(), digest_size=16).digest()
+
+    def _is_flagged(self, fp: bytes) -> bool:
+        flagged_at = self._flagged.get(fp)
+        if flagged_at is None:
+            return False
+        if time.time() - flagged_at > self.sketch.decay * 4:
+            del self._flagged[fp]
+            return False
+        return True
+
+    def observe(self, message) -> dict:
+        """Returns {chat_id: [message_ids]} to delete, empty if not part of a wave."""
+        if self.threshold <= 0:
+            return {}
+
+        fp = self.fingerprint(message)
+        if fp is None:
+            return {}
+
+        chat_id = message.chat.id
+        if self._is_flagged(fp):
+            return {chat_id: [message.id]}
+
+        self._recent.append((fp, chat_id, message.id))
+
+        pair = (fp, chat_id)
+        if pair in self._seen:
+            self._seen.move_to_end(pair)
+            return {}
+        self._seen[pair] = None
+        if len(self._seen) > self._recent.maxlen:
+            self._seen.popitem(last=False)
+
+        if self.sketch.add(fp) < self.threshold:
+            return {}
+
+        self._flagged[fp] = time.time()
+        if len(self._flagged) > 1000:
+            self._flagged.popitem(last=False)
+
+        wave = {}
+        for recent_fp, recent_chat, message_id in self._recent:
+            if recent_fp == fp:
+                wave.setdefault(recent_chat, []).append(message_id)
+        logger.warning(f"🌊 Spam wave flagged across {len(wave)} chats")
+        return wave
+
+    # ==========================================================
+    # checkpoint
+    # ==========================================================
+    async def restore(self):
+        data = await db.load_spam_sketch()
+        sketch = self.sketch
+        if not data or data["width"] != sketch.width or data["depth"] != sketch.depth:
+            return "fresh sketch"
+        sketch.counters = array("I")
+        sketch.counters.frombytes(data["counters"])
+        sketch.decayed_at = data["decayed_at"]
+        return "sketch restored"
+
+    async def checkpoint(self):
+        sketch = self.sketch
+        try:
+            await db.save_spam_sketch(sketch.width, sketch.depth, sketch.counters.tobytes(), sketch.decayed_at)
+        except Exception as e:
+            logger.error(f"Spam sketch checkpoint failed: {e}")
+
+    async def start(self):
+        restored = await self.restore()
+        self._task = asyncio.get_running_loop().create_task(self._checkpoint_loop())
+        return restored
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.checkpoint()
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self.checkpoint()
+
+
+spam_detector = SpamWaveDetector(
+    SPAM_WAVE_THRESHOLD, SPAM_WAVE_DECAY, SPAM_WAVE_WIDTH, SPAM_WAVE_DEPTH, SPAM_WAVE_CHECKPOINT
+)
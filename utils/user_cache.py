@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from pyrogram.types import User
+
+import db
+from config import USER_CACHE_SIZE, USER_CACHE_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Usernames can be released and claimed by someone else: like Pyrogram's
+# own storage, trust a username -> id mapping for a day at most
+USERNAME_TTL = 86400
+# Seen again after this long: refresh the mapping's age, memory and MongoDB
+USERNAME_REFRESH = USERNAME_TTL // 2
+
+
+class UserCache:
+    """
+    Bounded LRU of user identities learned from updates.
+
+    Usernames are resolved from memory first, then MongoDB, and only then
+    through `get_users` (one of Telegram's most rate-limited methods).
+    New or changed identities are written behind in batches. A username
+    hit older than USERNAME_TTL is confirmed through `get_users` again.
+    """
+
+    def __init__(self, max_size: int, flush_interval: int):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._by_id = OrderedDict()   # user_id -> (username, first_name, seen_at)
+        self._by_username = {}        # username (lowercase) -> user_id
+        self._dirty = {}              # user_id -> (username, first_name, seen_at)
+        self._flusher = None
+
+    # ==========================================================
+    # learning
+    # ==========================================================
+    def learn(self, user, persist: bool = True):
+        if not user or getattr(user, "is_deleted", False):
+            return
+
+        username = user.username.lower() if user.username else None
+        now = time.time()
+        entry = (username, user.first_name, now)
+
+        old = self._by_id.get(user.id)
+        if old and old[:2] == entry[:2] and now - old[2] < USERNAME_REFRESH:
+            self._by_id.move_to_end(user.id)
+            return
+
+        self._remember(user.id, entry)
+        if persist:
+            self._dirty[user.id] = entry
+            self._ensure_flusher()
+
+    def _remember(self, user_id: int, entry: tuple):
+        username = entry[0]
+        old = self._by_id.get(user_id)
+
+        # Username changed: drop the old mapping
+        if old and old[0] and old[0] != username and self._by_username.get(old[0]) == user_id:
+            del self._by_username[old[0]]
+
+        # Username moved to another account: the previous owner lost it
+        if username:
+            previous = self._by_username.get(username)
+            if previous is not None and previous != user_id and previous in self._by_id:
+                _, first_name, seen_at = self._by_id[previous]
+                self._by_id[previous] = (None, first_name, seen_at)
+            self._by_username[username] = user_id
+
+        self._by_id[user_id] = entry
+        self._by_id.move_to_end(user_id)
+
+        while len(self._by_id) > self.max_size:
+            evicted_id, (evicted_name, *_) = self._by_id.popitem(last=False)
+            if evicted_name and self._by_username.get(evicted_name) == evicted_id:
+                del self._by_username[evicted_name]
+
+    # ==========================================================
+    # resolution
+    # ==========================================================
+    def _as_user(self, client, user_id: int):
+        username, first_name, _ = self._by_id[user_id]
+        return User(client=client, id=user_id, first_name=first_name, username=username)
+
+    async def resolve(self, client, arg: str):
+        """Resolve `@username` or a numeric id to a User, or None."""
+        if arg.startswith("@"):
+            username = arg[1:].lower()
+            user_id = self._by_username.get(username)
+            if user_id is not None and time.time() - self._by_id[user_id][2] < USERNAME_TTL:
+                self._by_id.move_to_end(user_id)
+                return self._as_user(client, user_id)
+            query = {"username": username}
+        elif arg.isdigit():
+            user_id = int(arg)
+            if user_id in self._by_id:
+                self._by_id.move_to_end(user_id)
+                return self._as_user(client, user_id)
+            query = {"user_id": user_id}
+        else:
+            return None
+
+        try:
+            doc = await db.find_user_identity(**query)
+        except Exception as e:
+            logger.error(f"User index lookup failed: {e}")
+            doc = None
+
+        if doc and doc.get("first_name") is not None:
+            updated = doc.get("updated_at")
+            seen_at = updated.replace(tzinfo=timezone.utc).timestamp() if updated else 0
+            # An id is an id forever; a username only while the mapping is fresh
+            if "user_id" in query or time.time() - seen_at < USERNAME_TTL:
+                self._remember(doc["user_id"], (doc.get("username"), doc["first_name"], seen_at))
+                return self._as_user(client, doc["user_id"])
+
+        try:
+            user = await client.get_users(arg if arg.startswith("@") else int(arg))
+        except Exception:
+            if "username" in query:
+                self._forget_username(query["username"])
+            return None
+
+        self.learn(user)
+        return user
+
+    def _forget_username(self, username: str):
+        # Nobody holds it any more, as far as Telegram is concerned
+        user_id = self._by_username.pop(username, None)
+        if user_id in self._by_id:
+            _, first_name, seen_at = self._by_id[user_id]
+            self._by_id[user_id] = (None, first_name, seen_at)
+
+    # ==========================================================
+    # write-behind
+    # ==========================================================
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+
+        batch, self._dirty = self._dirty, {}
+        try:
+            await db.save_user_identities(
+                [(user_id, username, first_name) for user_id, (username, first_name, _) in batch.items()]
+            )
+        except Exception as e:
+            logger.error(f"User index flush failed ({len(batch)} entries): {e}")
+            # Keep anything learned in the meantime, it is newer
+            for user_id, entry in batch.items():
+                self._dirty.setdefault(user_id, entry)
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_FLUSH_INTERVAL)